@@ -0,0 +1,86 @@
+'''
+  Adaptive choice of the neighbourhood of every VNS step, in the style of ALNS: every arm (shake size k and move
+  type) keeps a weight that is pulled towards the reward of each of its uses, and arms are drawn by roulette wheel
+  over the weights with the solver's own random stream. Arms never tried are tried first, in a random order.
+  Move types:
+    rebuild: removeShifts k times and addShifts, the fixed step of vns.
+    local: the same followed by VNS.localSearch.
+  reward:
+    "gain": the cost gained by the step, so the choices only depend on the seed.
+    "rate": the cost gained per CPU second, which favours cheap arms but depends on the machine's timing.
+'''
+import numpy as np
+
+MOVES = ("rebuild", "local")
+REWARDS = ("gain", "rate")
+
+class NeighbourhoodController:
+    def __init__(self, kmax: int, rng, moves=MOVES, reward="gain", decay=0.2, floor=0.05) -> None:
+        if reward not in REWARDS:
+            raise ValueError(f"reward must be one of {REWARDS}")
+        self.arms = [(k, move) for k in range(1, kmax + 1, 2) for move in moves]
+        self.rng = rng
+        self.reward = reward
+        self.decay = decay
+        self.floor = floor
+        self.weights = np.zeros(len(self.arms))
+        self.uses = np.zeros(len(self.arms), dtype=int)
+        self.successes = np.zeros(len(self.arms), dtype=int)
+        self.gain = np.zeros(len(self.arms), dtype=int)
+        self.seconds = np.zeros(len(self.arms))
+        self.untried = list(self.rng.permutation(len(self.arms)))
+
+    def choose(self) -> int:
+    # Index of the arm of the next step
+        if self.untried:
+            return int(self.untried.pop())
+        top = np.max(self.weights)
+        if top <= 0:
+            return int(self.rng.integers(len(self.arms)))
+        weights = np.maximum(self.weights, self.floor * top)
+        return int(self.rng.choice(len(self.arms), p=weights / np.sum(weights)))
+
+    def update(self, arm: int, gain: int, seconds: float) -> None:
+    # Records a step of the arm, gain being how much it lowered the best cost
+        gain = max(0, int(gain))
+        self.uses[arm] += 1
+        self.successes[arm] += gain > 0
+        self.gain[arm] += gain
+        self.seconds[arm] += seconds
+        reward = gain if self.reward == "gain" else gain / max(seconds, 1e-6)
+        if self.uses[arm] == 1:
+            self.weights[arm] = reward
+        else:
+            self.weights[arm] += self.decay * (reward - self.weights[arm])
+
+    def saveState(self) -> dict:
+    # Arrays of the learned state, for checkpoints
+        return {
+            "weights": self.weights,
+            "uses": self.uses,
+            "successes": self.successes,
+            "gain": self.gain,
+            "seconds": self.seconds,
+            "untried": np.array(self.untried, dtype=int),
+        }
+
+    def restoreState(self, state: dict) -> None:
+        for name in ("weights", "uses", "successes", "gain", "seconds"):
+            np.copyto(getattr(self, name), state[name])
+        self.untried = [int(i) for i in state["untried"]]
+
+    def toDict(self) -> dict:
+        return {
+            "reward": self.reward,
+            "arms": [
+                {
+                    "k": k,
+                    "move": move,
+                    "uses": int(self.uses[i]),
+                    "successRate": float(self.successes[i] / self.uses[i]) if self.uses[i] else 0.0,
+                    "gainPerCpuSecond": float(self.gain[i] / self.seconds[i]) if self.seconds[i] else 0.0,
+                    "weight": float(self.weights[i]),
+                }
+                for i, (k, move) in enumerate(self.arms)
+            ],
+        }
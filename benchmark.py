@@ -0,0 +1,138 @@
+'''
+  Benchmark of Schedule, RND.randomSchedule, VNS.vns and VNS2.vns over every month in Dados and over synthetic
+  instances (see synthetic.py). For each case and solver it measures the time per VNS neighbourhood (or the
+  total time of the constructors), the peak memory and the final cost, compares them with the stored baseline
+  and exits with status 1 on a regression.
+    python benchmark.py                     # compare with benchmark_baseline.json
+    python benchmark.py --update-baseline   # store the current numbers as the baseline
+'''
+import argparse
+import gc
+import json
+import sys
+import tracemalloc
+from copy import deepcopy
+from time import perf_counter
+
+import synthetic
+from instance_cache import load_month
+from instances import build_solver, month_min
+from schedule import Schedule
+
+BASELINE = "benchmark_baseline.json"
+
+def timed(run):
+# Runs a function and returns (result, seconds), with the garbage collector off as timeit does
+    gc.collect()
+    gc.disable()
+    try:
+        start = perf_counter()
+        result = run()
+        return result, perf_counter() - start
+    finally:
+        gc.enable()
+
+def traced(run):
+# Runs a function and returns (result, peak MiB); tracemalloc slows Python down, so it is never timed
+    tracemalloc.start()
+    result = run()
+    peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+    tracemalloc.stop()
+    return result, peak
+
+def solvers(restrictions, people_dict, kmax, seed, measure):
+# Runs every solver once, measuring each step with measure
+    steps = {}
+    greed = Schedule(people_dict, deepcopy(restrictions["Shifts"]))
+    steps["Schedule"] = measure(greed.generateSchedule)
+    vns, measured = measure(lambda: build_solver(restrictions, people_dict, "VNS_R", seed, stats=True))
+    steps["Random"] = (vns.objective, measured)
+    steps["VNS_R"] = measure(lambda: vns.vns(kmax, 1))
+    vns2 = build_solver(restrictions, people_dict, "VNS_G", seed, greed, stats=True)
+    steps["Greed"] = (vns2.grdCost(), None)
+    steps["VNS_G"] = measure(lambda: vns2.vns(kmax, 1))
+    moves = {"VNS_R": vns.stats.counters["moves"], "VNS_G": vns2.stats.counters["moves"]}
+    return steps, moves
+
+def bench_case(restrictions, people_dict, kmax, seed):
+# Numbers of every solver on one instance, from a timed run and a traced run with the same seed
+    times, moves = solvers(restrictions, people_dict, kmax, seed, timed)
+    memory, _ = solvers(restrictions, people_dict, kmax, seed, traced)
+    results = {
+        "Schedule": {"seconds": times["Schedule"][1], "peak_mib": memory["Schedule"][1]},
+        "Random": {"seconds": times["Random"][1], "peak_mib": memory["Random"][1], "cost": times["Random"][0]},
+        "Greed": {"cost": times["Greed"][0]},
+    }
+    for solver in ("VNS_R", "VNS_G"):
+        results[solver] = {
+            "seconds_per_iteration": times[solver][1] / max(1, moves[solver]),
+            "peak_mib": memory[solver][1],
+            "cost": times[solver][0],
+        }
+    return results
+
+def cases(sizes, horizons):
+# (name, loader) of every benchmark case
+    for mes in month_min:
+        yield str(mes), lambda mes=mes: load_month(mes)
+    for people in sizes:
+        yield f"synthetic-{people}", lambda people=people: synthetic.restrictions(people, 1, seed=people)
+    for months in horizons:
+        yield f"synthetic-200x{months}m", lambda months=months: synthetic.restrictions(200, months, seed=months)
+
+def regressions(name, current, baseline, tolerance):
+# Messages for every number that got worse than the baseline
+    found = []
+    for solver, numbers in current.items():
+        for key, value in numbers.items():
+            before = baseline.get(solver, {}).get(key)
+            if before is None:
+                continue
+            if key == "cost":
+                worse = value > before
+            else:
+                # Absolute slack so timer noise on millisecond numbers is not reported
+                worse = value > before * (1 + tolerance) + (5e-3 if key != "peak_mib" else 0.05)
+            if worse:
+                found.append(f"{name} {solver} {key}: {before:.6g} -> {value:.6g}")
+    return found
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="50,200,1000", help="people of the synthetic instances")
+    parser.add_argument("--horizons", default="2", help="months of the synthetic 200 people horizons")
+    parser.add_argument("--kmax", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tolerance", type=float, default=1.0, help="allowed relative slowdown or memory growth")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    horizons = [int(h) for h in args.horizons.split(",") if h]
+    try:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+    except FileNotFoundError:
+        baseline = {}
+
+    current, found = {}, []
+    for name, loader in cases(sizes, horizons):
+        restrictions, people_dict = loader()
+        current[name] = bench_case(restrictions, people_dict, args.kmax, args.seed)
+        row = current[name]
+        print(f"{name:<20} VNS_R {row['VNS_R']['seconds_per_iteration'] * 1000:8.2f} ms/it cost {row['VNS_R']['cost']:>6}"
+              f" | VNS_G {row['VNS_G']['seconds_per_iteration'] * 1000:8.2f} ms/it cost {row['VNS_G']['cost']:>6}"
+              f" | peak {max(v.get('peak_mib', 0) for v in row.values()):7.2f} MiB", flush=True)
+        found += regressions(name, current[name], baseline.get(name, {}), args.tolerance)
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as file:
+            json.dump(current, file, indent=2)
+        return 0
+    for message in found:
+        print("REGRESSION", message)
+    return 1 if found else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
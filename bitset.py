@@ -0,0 +1,65 @@
+'''
+  Bitset representation of the schedule rows used by RND when bitset=True.
+  Bit t of a person's integer is the cell t of that person's row in x, R or possibleWorkDays. A month has at most
+  62 D/N shifts and fits in a machine word; Python integers also cover longer horizons.
+  Attributes:
+    size (int): The number of shifts in the month.
+    C (int): MaxConsecutiveShifts.
+    D (int): ConsecutiveRestTime.
+    full (int): Mask with every shift of the month set.
+    consecutiveMasks (list): For each shift, the start bits of the MaxConsecutiveShifts windows containing it.
+    restMasks (list): For each shift, the start bits of the ConsecutiveRestTime windows containing it.
+'''
+import numpy as np
+
+class BitsetRows:
+    def __init__(self, size: int, C: int, D: int) -> None:
+        self.size = size
+        self.C = C
+        self.D = D
+        self.full = (1 << size) - 1
+        # Same window ranges as RND.maxConsecutiveShifts and RND.consecutiveRestTime
+        self.consecutiveMasks = [self.windowMask(t, C, size - C - 1) for t in range(size)]
+        self.restMasks = [self.windowMask(t, C + D - 1, size - C - D) for t in range(size)]
+
+    def windowMask(self, shift: int, reach: int, windows: int) -> int:
+    # Start bits of the windows [i, i + reach] that contain the shift, among the first `windows` starts
+        first, last = max(0, shift - reach), min(shift, windows - 1)
+        if last < first: return 0
+        return ((1 << (last - first + 1)) - 1) << first
+
+    def violations(self, row: int, shift: int) -> tuple:
+    # Counts the violated windows of both rules that contain the shift
+        run = row
+        for j in range(1, self.C + 1):
+            run &= row >> j
+        consecutive = bin(run & self.consecutiveMasks[shift]).count("1")
+        full = self.full
+        for j in range(self.C):
+            full &= row >> j
+        busy = 0
+        for j in range(self.C, self.C + self.D):
+            busy |= row >> j
+        rest = bin(full & busy & self.restMasks[shift]).count("1")
+        return consecutive, rest
+
+    def flipDelta(self, row: int, shift: int) -> tuple:
+    # Change in the violation counters if the cell of the shift is flipped
+        shift = int(shift)
+        before = self.violations(row, shift)
+        after = self.violations(row ^ (1 << shift), shift)
+        return after[0] - before[0], after[1] - before[1]
+
+    def fromArray(self, matrix: np.ndarray) -> list:
+    # Packs the rows of a 0/1 matrix into integers
+        packed = np.packbits(np.asarray(matrix, dtype=bool), axis=1, bitorder="little")
+        return [int.from_bytes(row.tobytes(), "little") for row in packed]
+
+    def indices(self, row: int) -> list:
+    # Positions of the set bits of a row, in increasing order
+        found = []
+        while row:
+            low = row & -row
+            found.append(low.bit_length() - 1)
+            row ^= low
+        return found
@@ -0,0 +1,79 @@
+'''
+  Lower bound on RND.cost() for a month.
+  The cost of a shift is 2N when nobody works it and N - coverage otherwise, so covering a shift for the first
+  time gains N + 1 and every further person gains 1. Ignoring the consecutive shifts rules, the best gain is a
+  min-cost flow source -> person (MaxShifts) -> requested shift (1) -> sink, where each shift has one arc of
+  gain N + 1 and one of gain 1 for its remaining slots. The bound is the cost of the empty schedule minus that gain.
+'''
+from collections import deque
+
+import numpy as np
+
+class FlowGraph:
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self.edges = []  # [to, capacity, cost], the reverse edge of e is e ^ 1
+        self.adjacent = [[] for _ in range(size)]
+
+    def addEdge(self, source: int, target: int, capacity: int, cost: int) -> None:
+        self.adjacent[source].append(len(self.edges))
+        self.edges.append([target, capacity, cost])
+        self.adjacent[target].append(len(self.edges))
+        self.edges.append([source, 0, -cost])
+
+    def shortestPath(self, source: int, sink: int):
+    # Bellman-Ford with a queue (SPFA), needed because of the negative costs
+        distance = [float("inf")] * self.size
+        parent = [-1] * self.size
+        queued = [False] * self.size
+        distance[source] = 0
+        queue = deque([source])
+        while queue:
+            node = queue.popleft()
+            queued[node] = False
+            for e in self.adjacent[node]:
+                target, capacity, cost = self.edges[e]
+                if capacity > 0 and distance[node] + cost < distance[target]:
+                    distance[target] = distance[node] + cost
+                    parent[target] = e
+                    if not queued[target]:
+                        queued[target] = True
+                        queue.append(target)
+        return distance[sink], parent
+
+    def minCostFlow(self, source: int, sink: int) -> int:
+    # Augments along the cheapest path while it still lowers the cost, returns the total cost
+        total = 0
+        while True:
+            cost, parent = self.shortestPath(source, sink)
+            if cost >= 0:
+                return total
+            push, node = float("inf"), sink
+            while node != source:
+                e = parent[node]
+                push = min(push, self.edges[e][1])
+                node = self.edges[e ^ 1][0]
+            node = sink
+            while node != source:
+                e = parent[node]
+                self.edges[e][1] -= push
+                self.edges[e ^ 1][1] += push
+                node = self.edges[e ^ 1][0]
+            total += push * cost
+
+def lower_bound(solver) -> int:
+# Lower bound on the cost of any schedule of the solver's month
+    people, shifts = solver.R.shape
+    source, sink = people + shifts, people + shifts + 1
+    graph = FlowGraph(people + shifts + 2)
+    for p in range(people):
+        graph.addEdge(source, p, solver.M, 0)
+        for t in np.flatnonzero(solver.R[p]):
+            graph.addEdge(p, people + int(t), 1, 0)
+    for t in range(shifts):
+        slots = int(solver.capacity[t])
+        if slots > 0:
+            graph.addEdge(people + t, sink, 1, -(solver.N + 1))
+        if slots > 1:
+            graph.addEdge(people + t, sink, slots - 1, -1)
+    return 2 * solver.N * shifts + graph.minCostFlow(source, sink)
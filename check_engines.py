@@ -0,0 +1,152 @@
+'''
+  Equivalence and consistency checks of the solver engines, to run after changing Schedule, RND or VNS.
+    Schedule: the rosters built for every month in Dados and for seeded random instances (all four periods,
+      random priorities and MaxShifts) must match the digests in engines_reference.json, which were recorded
+      with the original string-keyed Schedule. Instances on which that Schedule never finished are skipped.
+    VNS and VNS2: every month and a synthetic instance are searched with the arrays, with the bitset rows and in
+      validate mode (every canAssign is compared with the full validators and every cost with a recount). The
+      three searches must end in the same x, and the counters kept up to date by setShift/clearShift and the
+      possible work days rebuilt only for dirty rows must match a rebuild from scratch. The costs and x are
+      compared with the digests of the reference too.
+    python check_engines.py                      # exits with status 1 on a mismatch
+    python check_engines.py --update-reference   # stores the current VNS digests as the reference
+'''
+import argparse
+import hashlib
+import json
+import random
+import sys
+from copy import deepcopy
+
+import numpy as np
+
+import synthetic
+from instance_cache import load_month
+from instances import build_solver, month_min
+from schedule import Schedule
+
+REFERENCE = "engines_reference.json"
+MODES = {"array": {}, "bitset": {"bitset": True}, "validate": {"validate": True}}
+
+def digest(value) -> str:
+    text = json.dumps(value, sort_keys=True, default=lambda item: item.tolist() if hasattr(item, "tolist") else int(item))
+    return hashlib.md5(text.encode()).hexdigest()[:16]
+
+def random_instance(seed: int) -> tuple:
+# Schedule inputs (people, vacancies) of a random instance
+    rng = random.Random(seed)
+    periods = rng.choice([["D", "N"], ["M", "T", "D", "N"], ["M", "T", "N"]])
+    days = rng.randint(3, 31)
+    shifts = [f"{day}{period}" for day in range(1, days + 1) for period in periods]
+    vacancies = [rng.choice(shifts) for _ in range(rng.randint(0, 3 * len(shifts) // 2))]
+    people = {}
+    for i in range(rng.randint(1, 12)):
+        requests = [rng.choice(shifts) for _ in range(rng.randint(0, 25))]
+        people[f"p{i}"] = {"Priority": rng.randint(0, 5), "Requests": requests, "MaxShifts": rng.randint(1, 12)}
+    return people, vacancies
+
+def schedule_digest(people: dict, vacancies: list) -> str:
+    greed = Schedule(deepcopy(people), list(vacancies))
+    greed.generateSchedule()
+    return digest([greed.schedule, greed.vacancies, greed.consecutive_counter])
+
+def schedule_cases(instances: int):
+# (name, people, vacancies) of every Schedule case
+    for mes in month_min:
+        restrictions, people_dict = load_month(mes)
+        yield str(mes), people_dict, restrictions["Shifts"]
+    for seed in range(instances):
+        yield f"random-{seed}", *random_instance(seed)
+
+def consistency(vns, rule=True) -> list:
+# Differences between the incremental state of a solver and a rebuild from scratch. With rule, x must also keep
+# the global rule (not both rules violated), which a VNS2 search started from a greedy roster may not
+    found = []
+    vns.removeImpossibleShifts()
+    possible = np.copy(vns.possibleWorkDays)
+    kept = (np.copy(vns.coverage), vns.objective, vns.consecutiveViolations, vns.restViolations,
+            np.copy(vns.rowConsecutive), np.copy(vns.rowRest))
+    vns.resetPossibleWorkDays()
+    if not np.array_equal(possible, vns.possibleWorkDays):
+        found.append("possible work days of the dirty rows differ from a full rebuild")
+    vns.recount()
+    rebuilt = (vns.coverage, vns.objective, vns.consecutiveViolations, vns.restViolations, vns.rowConsecutive, vns.rowRest)
+    names = ("coverage", "objective", "consecutiveViolations", "restViolations", "rowConsecutive", "rowRest")
+    found += [f"{name} differs from a recount" for name, a, b in zip(names, kept, rebuilt) if not np.array_equal(a, b)]
+    if not np.array_equal(vns.availableShifts, vns.capacity - vns.coverage):
+        found.append("availableShifts differs from the open slots of x")
+    if rule and vns.consecutiveViolations > 0 and vns.restViolations > 0:
+        found.append("x violates both rules")
+    return found
+
+def vns_case(restrictions: dict, people_dict: dict, kmax: int, max_iter: int, seed: int) -> tuple:
+# ({variant: digest}, problems) of the searches of one instance in every mode
+    digests, problems = {}, []
+    for variant in ("VNS_R", "VNS_G"):
+        runs = {}
+        for mode, options in MODES.items():
+            vns = build_solver(restrictions, people_dict, variant, seed, **options)
+            try:
+                cost = vns.vns(kmax, max_iter)
+            except AssertionError:
+                # Raised by the validate mode when an incremental check disagrees with the full one
+                problems.append(f"{variant} {mode}: an incremental check disagrees with the full validators")
+                continue
+            problems += [f"{variant} {mode}: {problem}" for problem in consistency(vns, variant == "VNS_R")]
+            runs[mode] = digest([cost, vns.x])
+        problems += [f"{variant} {mode} ends in another x than array" for mode in runs if runs[mode] != runs.get("array")]
+        digests[variant] = runs.get("array")
+    return digests, problems
+
+def vns_cases():
+    for mes in month_min:
+        yield str(mes), lambda mes=mes: load_month(mes)
+    yield "synthetic-50", lambda: synthetic.restrictions(50, 1, seed=50)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--instances", type=int, default=300, help="random Schedule instances")
+    parser.add_argument("--kmax", type=int, default=5)
+    parser.add_argument("--max-iter", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--reference", default=REFERENCE)
+    parser.add_argument("--update-reference", action="store_true")
+    args = parser.parse_args(argv)
+
+    with open(args.reference) as file:
+        reference = json.load(file)
+    found = []
+    checked = 0
+    for name, people, vacancies in schedule_cases(args.instances):
+        expected = reference["Schedule"].get(name)
+        if expected is None:
+            continue
+        checked += 1
+        if schedule_digest(people, vacancies) != expected:
+            found.append(f"Schedule {name}: roster differs from the reference")
+    print(f"Schedule: {checked} cases checked", flush=True)
+
+    # The VNS digests only hold for the search settings they were recorded with
+    settings = [args.kmax, args.max_iter, args.seed]
+    compare = not args.update_reference and reference.get("VNSSettings") == settings
+    current = {}
+    for name, loader in vns_cases():
+        restrictions, people_dict = loader()
+        current[name], problems = vns_case(restrictions, people_dict, args.kmax, args.max_iter, args.seed)
+        found += [f"{name} {problem}" for problem in problems]
+        if compare:
+            found += [f"{name} {variant}: result differs from the reference" for variant, value in current[name].items()
+                      if reference.get("VNS", {}).get(name, {}).get(variant, value) != value]
+        print(f"{name:<14} {'ok' if not problems else 'FAILED'}", flush=True)
+
+    if args.update_reference:
+        reference["VNS"] = current
+        reference["VNSSettings"] = settings
+        with open(args.reference, "w") as file:
+            json.dump(reference, file, indent=1)
+    for message in found:
+        print("MISMATCH", message)
+    return 1 if found else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
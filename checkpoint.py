@@ -0,0 +1,53 @@
+'''
+  Atomic checkpoint files. Everything is first written to a temporary file in the same directory and then moved
+  over the target with os.replace, so a process killed halfway leaves the previous checkpoint intact.
+  save/load keep numpy arrays plus a JSON header in one compressed .npz file (VNS.vns checkpoints).
+  CheckpointSettings tells VNS.vns where and how often to checkpoint:
+    path (str): The checkpoint file.
+    every (int): Saves every this many steps.
+    seconds (float): Saves once this many seconds passed since the last save.
+    resume (bool): Continues the search saved in path, if there is one, exactly where it stopped.
+  The search is also saved when vns returns.
+'''
+import json
+import os
+import tempfile
+
+import numpy as np
+
+def _replace(path: str, write) -> None:
+    folder = os.path.dirname(os.path.abspath(path))
+    os.makedirs(folder, exist_ok=True)
+    handle, work = tempfile.mkstemp(dir=folder, suffix=".tmp")
+    try:
+        with os.fdopen(handle, "wb") as file:
+            write(file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(work, path)
+    except BaseException:
+        os.remove(work)
+        raise
+
+class CheckpointSettings:
+    def __init__(self, path: str, every=None, seconds=None, resume=False) -> None:
+        self.path = path
+        self.every = every
+        self.seconds = seconds
+        self.resume = resume
+
+    def due(self, evaluated: int, since: float) -> bool:
+    # Whether to save after the step number evaluated, since seconds after the last save
+        return bool(self.every and evaluated % self.every == 0) or (self.seconds is not None and since >= self.seconds)
+
+def save(path: str, arrays: dict, header: dict) -> None:
+    header = json.dumps(header)
+    _replace(path, lambda file: np.savez_compressed(file, header=np.array(header), **arrays))
+
+def load(path: str) -> tuple:
+# Returns (arrays, header), or None when there is no checkpoint
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        arrays = {name: data[name] for name in data.files if name != "header"}
+        return arrays, json.loads(str(data["header"]))
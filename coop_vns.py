@@ -0,0 +1,83 @@
+'''
+  Cooperative VNS: several worker processes search the same month and share the best solution found so far.
+  The incumbent lives in a multiprocessing.shared_memory block laid out as [cost (int64), x (uint8, people x shifts)].
+  Every worker publishes its improvements and, whenever the shared incumbent is better than its own best_x,
+  restarts its neighbourhoods from it (see the exchange argument of VNS.vns).
+'''
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import Lock, shared_memory
+
+import numpy as np
+
+from instances import build_solver
+from stopping import StopCriteria
+
+class SharedIncumbent:
+    def __init__(self, shape: tuple, name=None, lock=None) -> None:
+    # Creates the shared block, or attaches to an existing one when a name is given
+        self.shape = shape
+        self.lock = lock
+        size = 8 + shape[0] * shape[1]
+        self.memory = shared_memory.SharedMemory(name=name, create=name is None, size=size)
+        self.cost = np.ndarray((1,), dtype=np.int64, buffer=self.memory.buf, offset=0)
+        self.x = np.ndarray(shape, dtype=np.uint8, buffer=self.memory.buf, offset=8)
+        if name is None:
+            self.cost[0] = np.iinfo(np.int64).max
+            self.x[:] = 0
+
+    def publish(self, x: np.ndarray, cost: int) -> None:
+    # Stores a solution if it is better than the shared one
+        with self.lock:
+            if cost < self.cost[0]:
+                self.x[:] = x
+                self.cost[0] = cost
+
+    def fetch(self, cost: int):
+    # Returns a copy of the shared solution and its cost if it is better than the given cost
+        with self.lock:
+            if self.cost[0] < cost:
+                return np.array(self.x), int(self.cost[0])
+        return None
+
+    def exchange(self, x: np.ndarray, cost: int):
+    # Hook for VNS.vns: publishes the worker's best and returns the shared one when it is better
+        self.publish(x, cost)
+        return self.fetch(cost)
+
+    def close(self, unlink=False) -> None:
+        del self.cost, self.x
+        self.memory.close()
+        if unlink:
+            self.memory.unlink()
+
+_incumbent = None
+
+def _attach(name, shape, lock):
+# Pool initializer: attaches the worker to the shared incumbent
+    global _incumbent
+    _incumbent = SharedIncumbent(shape, name, lock)
+
+def _search(restrictions, people_dict, variant, seed, kmax, max_iter, sync_every, time_limit):
+# Runs one worker and returns its own best cost
+    vns = build_solver(restrictions, people_dict, variant, seed)
+    _incumbent.publish(vns.x, vns.cost())
+    return vns.vns(kmax, max_iter, StopCriteria(time_limit=time_limit), _incumbent.exchange, sync_every)
+
+def cooperative_vns(restrictions, people_dict, kmax, max_iter, workers=None, seed=0, variant="VNS_R", sync_every=10, time_limit=None):
+# Runs the workers on one month and returns the best (cost, x) found by any of them
+    workers = workers or os.cpu_count() or 1
+    shape = (len(restrictions["People"]), 2 * restrictions["MonthDays"])
+    lock = Lock()
+    incumbent = SharedIncumbent(shape, lock=lock)
+    seeds = np.random.SeedSequence(seed).spawn(workers)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach, initargs=(incumbent.memory.name, shape, lock)) as pool:
+            futures = [
+                pool.submit(_search, restrictions, people_dict, variant, s, kmax, max_iter, sync_every, time_limit)
+                for s in seeds
+            ]
+            [f.result() for f in futures]
+        return int(incumbent.cost[0]), np.array(incumbent.x)
+    finally:
+        incumbent.close(unlink=True)
@@ -0,0 +1,114 @@
+'''
+  Decomposition of an instance into the connected components of its person-shift graph (a person is linked to
+  every shift of its row in R). People of different components never ask for the same shift, and the cost and
+  MaxPeoplePerShift are per shift, so every component can be searched on its own and the results stitched
+  back into one x.
+  The components are solved with their own copy of the feasibility counters, so the rule of canAssign (a flip
+  is refused only when both rules end up violated) is applied per component and not over the whole x. One
+  component may violate only the consecutive rule and another only the rest rule, so solve_components checks
+  the stitched x and, when it breaks both rules, repairs it with split_repair.
+'''
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from instances import build_solver
+from rnd_h import RND
+from shift_codec import encode, matrix_index
+from vns_mh import VNS
+
+def components(R) -> list:
+# (people, columns) of every component that has at least one request, in the order of its first person
+    R = np.asarray(R, dtype=bool)
+    done = np.zeros(R.shape[0], dtype=bool)
+    found = []
+    for root in np.flatnonzero(R.any(axis=1)):
+        if done[root]:
+            continue
+        people = np.zeros(R.shape[0], dtype=bool)
+        people[root] = True
+        while True:
+            columns = R[people].any(axis=0)
+            grown = R[:, columns].any(axis=1)
+            if np.array_equal(grown, people):
+                break
+            people = grown
+        done |= people
+        found.append((np.flatnonzero(people), np.flatnonzero(columns)))
+    return found
+
+def component_restrictions(restrictions: dict, people_dict: dict, people, columns) -> tuple:
+# Restrictions and Schedule inputs of one component, with the slots of every other shift closed
+    names = list(restrictions["People"])
+    names = [names[p] for p in people]
+    columns_of = matrix_index(encode(restrictions["Shifts"]))
+    keep = np.zeros(2 * restrictions["MonthDays"], dtype=bool)
+    keep[columns] = True
+    if "Slots" in restrictions:
+        slots = np.array(restrictions["Slots"], dtype=int)
+    else:
+        slots = np.zeros(len(keep), dtype=int)
+        np.add.at(slots, columns_of, 1)
+    slots[~keep] = 0
+
+    sub = dict(restrictions)
+    if isinstance(restrictions["People"], dict):
+        sub["People"] = {n: restrictions["People"][n] for n in names}
+    else:
+        sub["People"] = names
+    if "R" in restrictions:
+        sub["R"] = np.asarray(restrictions["R"])[people]
+    sub["Shifts"] = [s for s, c in zip(restrictions["Shifts"], columns_of) if keep[c]]
+    sub["Slots"] = slots
+    return sub, {n: people_dict[n] for n in names}
+
+def _solve(restrictions, people_dict, variant, seed, kmax, max_iter, options):
+# Searches one component and returns its x
+    vns = build_solver(restrictions, people_dict, variant, seed)
+    vns.vns(kmax, max_iter, **options)
+    return vns.x
+
+def split_repair(vns) -> int:
+# Clears shifts from the rows that violate the rule with fewer violated windows until x keeps that rule, then
+# refills the open slots as the repair step of vns does, and returns the number of shifts cleared
+    rule = 0 if vns.consecutiveViolations <= vns.restViolations else 1
+    rows = (vns.rowConsecutive, vns.rowRest)[rule]
+    cleared = 0
+    for p in np.flatnonzero(rows):
+        while rows[p] > 0:
+            # Clearing a shift never adds a violated window, and some shift of a violating row takes one away
+            worked = np.flatnonzero(vns.x[p])
+            deltas = [vns.flipDelta(p, t)[rule] for t in worked]
+            t = worked[int(np.argmin(deltas))]
+            vns.clearShift(p, t)
+            vns.availableShifts[t] += 1
+            cleared += 1
+    vns.repair()
+    return cleared
+
+def solve_components(restrictions, people_dict, kmax, max_iter, workers=1, seed=0, variant="VNS_R", **options) -> tuple:
+# Solves every component, serially with workers=1 or in a process pool (None uses every CPU), and returns
+# (cost, x) of the stitched solution. options are passed to every vns call
+# A stitched x that violates both rules is repaired with split_repair, so the result always keeps the global rule
+    parts = components(restrictions["R"] if "R" in restrictions else RND(restrictions).R)
+    seeds = np.random.SeedSequence(seed).spawn(len(parts))
+    jobs = [
+        (*component_restrictions(restrictions, people_dict, people, columns), variant, s, kmax, max_iter, options)
+        for (people, columns), s in zip(parts, seeds)
+    ]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(jobs) == 1:
+        results = [_solve(*job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+            results = list(pool.map(_solve, *zip(*jobs)))
+
+    whole = VNS(restrictions, seed)
+    x = np.zeros_like(whole.x)
+    for (people, _), part in zip(parts, results):
+        x[people] = part
+    whole.loadSolution(x)
+    if whole.consecutiveViolations > 0 and whole.restViolations > 0:
+        split_repair(whole)
+    return whole.cost(), np.copy(whole.x)
@@ -0,0 +1,94 @@
+'''
+  Compiled months: every Dados/{month}.json is turned once into a directory of .npy files and then opened
+  with mmap_mode, so pool workers and repeated runs do not parse and copy the JSON again.
+  The directory is Dados/cache/{month}-{hash}, where hash is the SHA-256 of the month's JSON and of
+  Dados/month_data.json, so editing either one compiles the month again.
+  Files:
+    R.npy (uint8, people x shifts): The request matrix of RND.
+    slots.npy (int16, shifts): The number of slots of each column of x.
+    names.npy (str, people): The people in the order of the JSON.
+    shifts.npy (int16): The codes (see shift_codec) of the month's shift list, in order.
+    requests.npy (int16), offsets.npy (int32): The codes of every person's requests in order, person p owning
+      requests[offsets[p]:offsets[p + 1]].
+'''
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+
+from instances import json_to_dict, cat_shifts_month, get_days_in_month, month_restrictions, people_priorities
+from shift_codec import decode, encode, encode_people, matrix_index
+
+CACHE_DIR = "./Dados/cache"
+
+def source_hash(mes) -> str:
+    digest = hashlib.sha256()
+    for path in (f"./Dados/{mes}.json", "./Dados/month_data.json"):
+        with open(path, "rb") as file:
+            digest.update(file.read())
+    return digest.hexdigest()[:16]
+
+def compile_month(mes, path: str) -> None:
+# Writes the .npy files of a month, atomically so concurrent workers never see half a bundle
+    people = json_to_dict(f"./Dados/{mes}.json")
+    shifts = cat_shifts_month(str(mes))
+    columns = 2 * get_days_in_month(mes)
+
+    R = np.zeros((len(people), columns), dtype=np.uint8)
+    rows, cols = encode_people(people)
+    R[rows, cols] = 1
+    slots = np.zeros(columns, dtype=np.int16)
+    np.add.at(slots, matrix_index(encode(shifts)), 1)
+    lengths = [len(requests) for requests in people.values()]
+    offsets = np.concatenate(([0], np.cumsum(lengths))).astype(np.int32)
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    work = tempfile.mkdtemp(dir=CACHE_DIR)
+    np.save(os.path.join(work, "R.npy"), R)
+    np.save(os.path.join(work, "slots.npy"), slots)
+    np.save(os.path.join(work, "names.npy"), np.array(list(people.keys())))
+    np.save(os.path.join(work, "shifts.npy"), encode(shifts))
+    np.save(os.path.join(work, "requests.npy"), encode([s for requests in people.values() for s in requests]))
+    np.save(os.path.join(work, "offsets.npy"), offsets)
+    try:
+        os.rename(work, path)
+    except OSError:
+        # Another process compiled the same month first
+        for name in os.listdir(work):
+            os.remove(os.path.join(work, name))
+        os.rmdir(work)
+
+class Instance:
+    def __init__(self, mes, path: str) -> None:
+        self.mes = mes
+        self.R = np.load(os.path.join(path, "R.npy"), mmap_mode="r")
+        self.slots = np.load(os.path.join(path, "slots.npy"), mmap_mode="r")
+        self.names = np.load(os.path.join(path, "names.npy"))
+        self.shifts = np.load(os.path.join(path, "shifts.npy"), mmap_mode="r")
+        self.requests = np.load(os.path.join(path, "requests.npy"), mmap_mode="r")
+        self.offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode="r")
+
+    def restrictions(self) -> dict:
+    # Same restrictions as instances.load_month, with the compiled request matrix and slots
+        restrictions = month_restrictions(self.mes, list(self.names), decode(self.shifts))
+        restrictions["R"] = self.R
+        restrictions["Slots"] = self.slots
+        return restrictions
+
+    def people_dict(self) -> dict:
+    # Inputs of Schedule, with every person's requests in the original order
+        people = {str(p): decode(self.requests[self.offsets[c]:self.offsets[c + 1]]) for c, p in enumerate(self.names)}
+        return people_priorities(people)
+
+def load_instance(mes) -> Instance:
+# Opens the compiled month, compiling it first if it is missing or out of date
+    path = os.path.join(CACHE_DIR, f"{mes}-{source_hash(mes)}")
+    if not os.path.isdir(path):
+        compile_month(mes, path)
+    return Instance(mes, path)
+
+def load_month(mes):
+# Drop-in replacement of instances.load_month backed by the cache
+    instance = load_instance(mes)
+    return instance.restrictions(), instance.people_dict()
@@ -0,0 +1,105 @@
+'''
+  Helpers to read the months in Dados, build the inputs of Schedule, VNS and VNS2 and the solvers themselves.
+'''
+import json
+from calendar import monthrange
+from copy import deepcopy
+from time import perf_counter
+
+from schedule import Schedule
+from vns_mh import VNS
+from vns_mh2 import VNS2
+
+def json_to_dict(file_path):
+    with open(file_path, "r") as file:
+        data = json.load(file)
+
+    result = {}
+    for item in data:
+        if isinstance(item, dict):
+            nome = item["nome"]
+            dias = item["dias"].split()
+            result[nome] = dias
+
+    return result
+
+def cat_shifts_month(month):
+    with open("./Dados/month_data.json", "r") as file:
+        data = json.load(file)
+
+    return data[month]
+
+def get_days_in_month(month):
+    year = int(str(month)[:4])
+    month_number = int(str(month)[4:])
+
+    return monthrange(year, month_number)[1]
+
+month_min = {
+    202401 : 4,
+    202402 : 5,
+    202403 : 2,
+    202404 : 1,
+    202405 : 5,
+    202406 : 5,
+    202407 : 5,
+    202408 : 5,
+    202409 : 5,
+    202410 : 5,
+    202411 : 5,
+    202412 : 5,
+    202501 : 5,
+    202502 : 5,
+    202503 : 5,
+    202504 : 5,
+    202505 : 5,
+    202506 : 5,
+}
+
+def month_restrictions(mes, people, shifts, min_shifts=None):
+    return {
+        "People": people,
+        "Shifts": shifts,
+        "MaxPeoplePerShift": 2,
+        "MinShifts": month_min[mes] if min_shifts is None else min_shifts,
+        "MaxShifts": 10,
+        "MaxConsecutiveShifts": 1,
+        "ConsecutiveRestTime": 6,
+        "MonthDays": get_days_in_month(mes),
+    }
+
+def people_priorities(people):
+    people_dict = {}
+    c = 0
+    for p in people.keys():
+        people_dict[p] = {
+            "Priority": c,
+            "Requests": people[p],
+            "MaxShifts": 10,
+        }
+        c += 1
+
+    return people_dict
+
+def load_month(mes):
+    people = json_to_dict(f"./Dados/{mes}.json")
+    shifts = cat_shifts_month(str(mes))
+
+    return month_restrictions(mes, people, shifts), people_priorities(people)
+
+def build_solver(restrictions, people_dict, variant, seed, greed=None, **options):
+# Solver of a variant with its start: VNS from a random schedule for "VNS_R", otherwise VNS2 from the greedy
+# Schedule, which is generated here unless greed is given. options go to the solver (stats, bitset, validate)
+    if variant == "VNS_R":
+        vns = VNS(restrictions, seed, **options)
+        vns.randomSchedule()
+        return vns
+    start = perf_counter()
+    if greed is None:
+        greed = Schedule(people_dict, deepcopy(restrictions["Shifts"]))
+        greed.generateSchedule()
+    greedT = perf_counter() - start
+    vns = VNS2(restrictions, greed, seed, **options)
+    if vns.stats:
+        vns.stats.phases["construction"] += greedT
+    return vns
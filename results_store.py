@@ -0,0 +1,175 @@
+'''
+  Append-only store of the experiment results in long format, one CSV row per finished job, flushed to disk as
+  soon as the job ends so a sweep killed halfway keeps every job it finished.
+  Fields:
+    month, variant, seed, k_max, max_iter: The job.
+    adaptive (str): The adaptive setting of vns (see adaptive.py), empty without it. Part of the job too, as it
+      changes the results.
+    people, shifts, min_shifts: Size of the month.
+    lower_bound, start_cost, cost: The bound, the cost of the initial (random or greedy) solution and of VNS.
+    duration (float): Seconds of the job.
+    stop_reason (str): Why vns stopped.
+    stats (str): The job statistics as JSON (see stats.SolverStats), empty when they were not collected.
+  A store written before a field was added is rewritten with the current header on its next append.
+  report() pivots the records of one seed back into the layout of results_all_combinations_seed{seed}.csv.
+'''
+import csv
+import json
+import os
+import tempfile
+
+import pandas as pd
+
+from instances import month_min
+
+FIELDS = {
+    "month": int,
+    "variant": str,
+    "seed": int,
+    "k_max": int,
+    "max_iter": lambda value: int(value) if value else None,
+    "adaptive": lambda value: value or None,
+    "people": int,
+    "shifts": int,
+    "min_shifts": int,
+    "lower_bound": int,
+    "start_cost": int,
+    "cost": int,
+    "duration": float,
+    "stop_reason": str,
+    "stats": lambda value: json.loads(value) if value else None,
+}
+
+def csv_row(record: dict) -> dict:
+# The CSV row of a record
+    values = dict(record)
+    values["stats"] = json.dumps(values["stats"]) if values.get("stats") is not None else ""
+    return values
+
+def job_key(record: dict) -> tuple:
+# The (month, k_max, max_iter, seed, variant, adaptive) job of a record, as in runner.grid_jobs
+    return record["month"], record["k_max"], record["max_iter"], record["seed"], record["variant"], record["adaptive"]
+
+class ResultsStore:
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def trim(self) -> None:
+    # Drops a last line left halfway by a crash, which may end inside a quoted field, by truncating the file
+    # after its last newline. No field holds a newline, so every complete row ends with one
+        with open(self.path, "r+b") as file:
+            end = file.seek(0, os.SEEK_END)
+            position = end
+            while position > 0:
+                step = min(4096, position)
+                file.seek(position - step)
+                newline = file.read(step).rfind(b"\n")
+                if newline >= 0:
+                    position += newline + 1 - step
+                    break
+                position -= step
+            if position < end:
+                file.truncate(position)
+                file.flush()
+                os.fsync(file.fileno())
+
+    def upgrade(self) -> None:
+    # Rewrites a store with an older header under the current one, through a temporary file as checkpoint.py does
+        with open(self.path, newline="") as file:
+            if next(csv.reader(file), list(FIELDS)) == list(FIELDS):
+                return
+        records = self.records()
+        handle, work = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)), suffix=".tmp")
+        try:
+            with os.fdopen(handle, "w", newline="") as file:
+                writer = csv.DictWriter(file, fieldnames=list(FIELDS))
+                writer.writeheader()
+                writer.writerows(csv_row(record) for record in records)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(work, self.path)
+        except BaseException:
+            os.remove(work)
+            raise
+
+    def append(self, record: dict) -> None:
+    # Writes one record and forces it to disk
+        if os.path.exists(self.path):
+            self.trim()
+            self.upgrade()
+        new = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        with open(self.path, "a", newline="") as file:
+            writer = csv.DictWriter(file, fieldnames=list(FIELDS))
+            if new:
+                writer.writeheader()
+            writer.writerow(csv_row(record))
+            file.flush()
+            os.fsync(file.fileno())
+
+    def records(self) -> list:
+    # Every complete record in the order it was written; a last line cut by a crash is skipped
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, newline="") as file:
+            found = []
+            for row in csv.DictReader(file):
+                try:
+                    # A field missing from an older header reads as empty
+                    found.append({name: convert(row.get(name, "")) for name, convert in FIELDS.items()})
+                except (TypeError, ValueError):
+                    continue
+            return found
+
+    def finished(self, stats=False) -> set:
+    # Jobs of the store; with stats only those stored with their statistics
+        return {job_key(record) for record in self.records() if record["stats"] or not stats}
+
+def cells(record: dict) -> list:
+# The (row, value) cells a record fills in the report of its seed
+    tag = f"Seed: {record['seed']} - k_max: {record['k_max']} - max_iter{record['max_iter']}"
+    gap = record["cost"] - record["lower_bound"]
+    if record["variant"] == "VNS_R":
+        return [
+            ("LowerBound", record["lower_bound"]),
+            (f"Cost(Random) - {tag}", record["start_cost"]),
+            (f"Cost(VNS_R) - {tag}", record["cost"]),
+            (f"Gap(VNS_R) - {tag}", gap),
+            (f"Duration - {tag}", record["duration"]),
+        ]
+    return [
+        ("Cost(Greed)", record["start_cost"]),
+        (f"Cost(VNS_G) - {tag}", record["cost"]),
+        (f"Gap(VNS_G) - {tag}", gap),
+        (f"Duration - {tag}", record["duration"]),
+    ]
+
+def report(records: list, seed: int, order=None) -> pd.DataFrame:
+# Wide report of one seed, filled in the order of the jobs in order (runner.grid_jobs) or, without it,
+# in month, k_max, max_iter and variant order
+    records = {job_key(record): record for record in records if record["seed"] == seed}
+    if order is None:
+        order = sorted(records, key=lambda job: (job[0], job[1], job[2] or 0, job[4], job[5] or ""))
+    entries = []
+    for job in order:
+        record = records.get(tuple(job))
+        if record is None:
+            continue
+        mes = record["month"]
+        entries += [("People", mes, record["people"]), ("Shifts", mes, record["shifts"]), ("MinShifts", mes, record["min_shifts"])]
+        entries += [(row, mes, value) for row, value in cells(record)]
+    if not entries:
+        return pd.DataFrame(columns=month_min.keys())
+    rows, months, values = zip(*entries)
+    # An object column keeps the costs as integers next to the float durations
+    long = pd.DataFrame.from_records({"row": rows, "month": months, "value": pd.Series(values, dtype=object)})
+    # A cell filled by several jobs (LowerBound, Cost(Greed)) keeps the value of the last one
+    long = long.drop_duplicates(["row", "month"], keep="last")
+    df = long.pivot(index="row", columns="month", values="value")
+    df = df.reindex(index=list(dict.fromkeys(rows)), columns=list(month_min))
+    df.index.name = None
+    df.columns.name = None
+    return df
+
+def load_report(path: str, seed: int) -> pd.DataFrame:
+# Reads a store and pivots one seed into the report layout
+    return report(ResultsStore(path).records(), seed)
@@ -2,28 +2,40 @@
   restictions (dict): A dictionary with the following keys
         People (dict): A dictionary with the people's names as keys and their requests as values. 
             Requests (list): A list of shifts the person can work.
+            With a compiled R (see instance_cache) it can be just the list of names.
         Shifts (list): A list of available shifts.
+        R (array, optional): The compiled request matrix, people x shifts.
+        Slots (array, optional): The compiled number of slots of each shift.
         MaxPeoplePerShift (int): The maximum number of people that can work in a shift.
         MinShifts (int): The minimum number of shifts a person can work.
         MaxShifts (int): The maximum number of shifts a person can work.
         MaxConsecutiveShifts (int): The maximum number of consecutive shifts a person can work.
         ConsecutiveRestTime (int): The minimum rest time after achieving a MaxConsectiveShifts.
         MonthDays (int): The number of days in the month.
+  seed (int | SeedSequence | Generator): Seed of the solver's own random stream, or the Generator itself.
+  validate (bool): Re-runs the full constraint validators and cost after every local check (debug only).
+  bitset (bool): Keeps the rows of x and R as integers and checks feasibility with the bitset.BitsetRows masks.
+  stats (bool): Collects hot path counters, phase timers and the convergence trace in self.stats (stats.SolverStats).
 '''
 import numpy as np
-import copy
+from bitset import BitsetRows
+from shift_codec import encode, encode_people, matrix_index
+from stats import SolverStats, phase
 
 class RND:
-    def __init__(self, restrictions: dict, seed=0) -> None:
+    def __init__(self, restrictions: dict, seed=0, validate=False, bitset=False, stats=False) -> None:
         # Initialize the RND class
-        # Deep copy the restrictions to avoid modifying the original data
-        restrictions = copy.deepcopy(restrictions)
+        # Nothing below modifies the restrictions, so a shallow copy is enough
+        restrictions = dict(restrictions)
         
-        # Set the random seed for reproducibility
-        np.random.seed(seed)
+        # Own random stream, so solvers in the same process do not interfere
+        self.rng = np.random.default_rng(seed)
+        self.stats = SolverStats() if stats else None
         
         # Initialize people and shifts
-        self.P = np.array(list(restrictions['People'].keys()))
+        self.P = np.array(list(restrictions['People']))
+        # Names of the rows of x, while P holds them in the current random order
+        self.names = np.copy(self.P)
         self.allShifts = np.array([f"{i}{j}" for i in range(1, restrictions["MonthDays"] + 1) for j in ['D', 'N']])
         
         self.T = np.array(list(dict.fromkeys(restrictions['Shifts']))) if 'Shifts' in restrictions else self.allShifts
@@ -35,97 +47,148 @@ class RND:
         self.C = restrictions['MaxConsecutiveShifts']
         self.D = restrictions['ConsecutiveRestTime']
         
-        # Initialize x and y arrays
-        self.x = np.zeros((len(self.P), len(self.allShifts)), dtype=int)
-        self.y = np.zeros((len(self.allShifts)), dtype=int)
+        # Initialize x and y arrays, 0/1 cells kept as uint8/bool
+        self.x = np.zeros((len(self.P), len(self.allShifts)), dtype=np.uint8)
+        self.y = np.zeros((len(self.allShifts)), dtype=bool)
         
         # Create index mappings
         self.peopleIndex = {p: i for i, p in enumerate(self.P)}
         self.shiftIndex = {s: i for i, s in enumerate(self.allShifts)}
         
-        # Initialize the R array
-        R = restrictions['People']
-        self.R = np.zeros((len(self.P), len(self.allShifts)), dtype=int)
-        rows = np.array([self.peopleIndex[p] for p in self.P for s in R[p]])
-        cols = np.array([self.shiftIndex[s] for p in self.P for s in R[p]])
-        self.R[rows, cols] = 1
+        # Initialize the R array, parsing the requests once through the shift codec
+        if 'R' in restrictions:
+            self.R = restrictions['R']
+        else:
+            self.R = np.zeros((len(self.P), len(self.allShifts)), dtype=np.uint8)
+            rows, cols = encode_people(restrictions['People'])
+            self.R[rows, cols] = 1
+        self.Tindex = matrix_index(encode(self.T))
+        self.Tmask = np.zeros(len(self.allShifts), dtype=bool)
+        self.Tmask[self.Tindex] = True
         
         # Initialize possible requests
-        self.requests = np.copy(self.R)
+        self.requests = np.array(self.R, dtype=np.uint8)
         
-        # Initialize the minimum and maximum shifts counters
-        self.minimum = {p: 0 for p in self.P}
-        self.maximum = {p: 0 for p in self.P}
+        # Initialize the minimum and maximum shifts counters, indexed like the rows of x
+        self.minimum = np.zeros(len(self.P), dtype=int)
+        self.maximum = np.zeros(len(self.P), dtype=int)
         
         # Auxiliary variables
         self.peopleNumber = len(self.P)
         self.remainingRequests = np.count_nonzero(self.R)
         self.shifts = restrictions['Shifts'] if 'Shifts' in restrictions else None
-        if self.shifts:
+        if 'Slots' in restrictions:
+            self.availableShifts = np.array(restrictions['Slots'], dtype=int)
+        elif self.shifts:
             self.availableShifts = np.zeros(len(self.allShifts), dtype=int)
-            shifts, shiftCounts = np.unique(self.shifts, return_counts=True) 
-            for shift, count in zip(shifts, shiftCounts):
-                self.availableShifts[self.shiftIndex[shift]] = count 
+            np.add.at(self.availableShifts, matrix_index(encode(self.shifts)), 1)
         else:
             self.availableShifts = np.full(len(self.allShifts) , self.N)
         self.remainingShifts = np.sum(self.availableShifts)
+        self.capacity = np.copy(self.availableShifts)
+        
+        # Violated windows of each rule over the whole x, kept up to date by setShift/clearShift
+        self.validate = validate
+        self.consecutiveViolations = 0
+        self.restViolations = 0
+        self.rowConsecutive = np.zeros(self.peopleNumber, dtype=int)
+        self.rowRest = np.zeros(self.peopleNumber, dtype=int)
+        
+        # Rows of x changed since their possible work days were last rebuilt
+        self.dirty = np.ones(self.peopleNumber, dtype=bool)
+        
+        # People working each shift and the cost of x, kept up to date by setShift/clearShift
+        self.coverage = np.zeros(len(self.allShifts), dtype=int)
+        self.objective = 2 * self.N * len(self.allShifts)
+        
+        # Scratch buffers, so restoring a snapshot and recounting do not allocate
+        self.changed = np.zeros(self.x.shape, dtype=bool)
+        self.changedRows = np.zeros(self.peopleNumber, dtype=bool)
+        self.prefix = np.zeros((self.peopleNumber, len(self.allShifts) + 1), dtype=int)
+        self.worked = np.zeros(self.peopleNumber, dtype=int)
+        self.reached = np.zeros(self.peopleNumber, dtype=bool)
+        self.stop = np.zeros(self.peopleNumber, dtype=bool)
+        self.cells = np.zeros(len(self.allShifts), dtype=int)
+        
+        # Rows of the people in the order of P, shuffled together with it
+        self.order = np.arange(self.peopleNumber)
+        
+        # Optional bitset core, one integer per row of x and R
+        self.bits = BitsetRows(len(self.allShifts), self.C, self.D) if bitset else None
+        if self.bits:
+            self.xRows = [0] * self.peopleNumber
+            self.rRows = self.bits.fromArray(self.R)
         
     def randomOrder(self) -> None:
-    # Randomly shuffle the order of the people
-        np.random.shuffle(self.P)
+    # Randomly shuffle the order of the people, shuffling the row ids in order with the same draws
+        self.rng.shuffle(self.order)
+        np.take(self.names, self.order, out=self.P)
+    
+    def pickCell(self, row: np.ndarray) -> int:
+    # A uniformly drawn cell set in a 0/1 row, with the same draw as rng.choice(np.flatnonzero(row))
+        np.cumsum(row, out=self.cells)
+        return int(np.searchsorted(self.cells, self.rng.integers(self.cells[-1]), side="right"))
     
-    def assignShifts(self, person: str) -> None:
+    def assignShifts(self, id: int) -> None:
     # Assign shifts to people while checking the constraints
         self.remainingRequests -= 1
-        t = np.random.choice(np.where(self.requests[self.peopleIndex[person]] == 1)[0])
-        self.requests[self.peopleIndex[person], t] = 0
-        canAssign = self.availableShifts[t] > 0
-        if canAssign:
-            self.x[self.peopleIndex[person], t] = 1
-            if not self.maxConsecutiveShifts() and not self.consecutiveRestTime():
-                self.x[self.peopleIndex[person], t] = 0
+        t = self.pickCell(self.requests[id])
+        self.requests[id, t] = 0
+        hasVacancy = self.availableShifts[t] > 0
+        if hasVacancy:
+            if not self.canAssign(id, t):
                 return
+            self.setShift(id, t)
             self.availableShifts[t] -= 1
             self.remainingShifts -= 1
     
     def garanteeMinimum(self) -> None:
     # Generate a random starting schedule that tries to satidfy the minimum shifts constraint
-        stop = {p : 0 for p in self.P}
-        while sum(stop.values()) < self.peopleNumber:
-            for p in self.P:
-                if self.minimum[p] < 1 and np.sum(self.requests[self.peopleIndex[p]]) > 0:
+        stop = self.stop
+        stop[:] = False
+        while not stop.all():
+            for p in self.order:
+                if self.minimum[p] < 1 and self.requests[p].any():
                     self.assignShifts(p)
                 else:
-                    stop[p] = 1
+                    stop[p] = True
             #self.updateStop(stop)
             self.updateMinMax()
     
     def fillRemaining(self) -> None: 
     # Continues the schedule generation from where garanteeMinimum left off
-        stop = {p : 0 for p in self.P}
-        while sum(stop.values()) < self.peopleNumber:
-            for p in self.P:
-                if self.maximum[p] < 1 and np.sum(self.requests[self.peopleIndex[p]]) > 0:
+        stop = self.stop
+        stop[:] = False
+        while not stop.all():
+            for p in self.order:
+                if self.maximum[p] < 1 and self.requests[p].any():
                     self.assignShifts(p)
                 else:
-                    stop[p] = 1
+                    stop[p] = True
             #self.updateStop(stop)
             self.updateMinMax()
     
-    def updateStop(self, stop: dict) -> None:
+    def updateStop(self, stop: np.ndarray) -> None:
     # Updates the stop condition for the assigment of shifts
     # Checks if there are no more requests or shifts available
         if self.remainingRequests < 1 or self.remainingShifts < 1:
-            [stop.update({p: 1}) for p in self.P]
+            stop[:] = 1
+    
+    def workedShifts(self) -> np.ndarray:
+    # Number of shifts of T worked by each person, in a buffer that the next call overwrites
+        return np.sum(self.x, axis=1, dtype=int, where=self.Tmask, out=self.worked)
     
     def updateMinMax(self) -> None:
     # Updates the minimum and maximum shifts counters for each person
-        [self.minimum.update({p: 1}) for p in self.P if sum(self.x[self.peopleIndex[p]][self.shiftIndex[t]] for t in self.T) >= self.m]
-        [self.maximum.update({p: 1}) for p in self.P if sum(self.x[self.peopleIndex[p]][self.shiftIndex[t]] for t in self.T) == self.M] 
+        worked = self.workedShifts()
+        np.greater_equal(worked, self.m, out=self.reached)
+        np.bitwise_or(self.minimum, self.reached, out=self.minimum)
+        np.equal(worked, self.M, out=self.reached)
+        np.bitwise_or(self.maximum, self.reached, out=self.maximum)
        
     def minShifts(self) -> bool:
     # Checks if the minimum shifts constraint is satisfied    
-        return all(sum(self.x[self.peopleIndex[p]][self.shiftIndex[t]] for t in self.T) >= self.m for p in self.P)
+        return bool(np.all(self.workedShifts() >= self.m))
     
     def maxConsecutiveShifts(self) -> bool:
     # Checks if the maximum consecutive shifts constraint is satisfied      
@@ -148,21 +211,141 @@ class RND:
             for i in range(len(self.allShifts) - self.C - self.D)
         )  
     
+    def windowViolations(self, person: int, shift: int) -> tuple:
+    # Counts the violated windows of both rules that contain the given cell of a person's row
+        T = len(self.allShifts)
+        start = max(0, shift - self.C - self.D)
+        row = self.x[person, start:shift + self.C + self.D + 1].tolist()
+        consecutive = 0
+        for i in range(max(0, shift - self.C), min(shift, T - self.C - 2) + 1):
+            if sum(row[i - start:i - start + self.C + 1]) > self.C:
+                consecutive += 1
+        rest = 0
+        for i in range(max(0, shift - self.C - self.D + 1), min(shift, T - self.C - self.D - 1) + 1):
+            j = i - start + self.C
+            if sum(row[i - start:j]) == self.C and any(row[j:j + self.D]):
+                rest += 1
+        return consecutive, rest
+    
+    def flipDelta(self, person: int, shift: int) -> tuple:
+    # Change in the violation counters if the cell of a person's row is flipped
+        if self.bits:
+            return self.bits.flipDelta(self.xRows[person], shift)
+        before = self.windowViolations(person, shift)
+        self.x[person, shift] ^= 1
+        after = self.windowViolations(person, shift)
+        self.x[person, shift] ^= 1
+        return after[0] - before[0], after[1] - before[1]
+    
+    def canAssign(self, person: int, shift: int) -> bool:
+    # Checks if a shift can be given to a person looking only at the windows around that cell
+    # As in the full validators, the flip is refused only when both rules end up violated
+        if self.stats:
+            self.stats.count("constraintChecks")
+        consecutive, rest = self.flipDelta(person, shift)
+        possible = not (self.consecutiveViolations + consecutive > 0 and self.restViolations + rest > 0)
+        if self.validate:
+            self.x[person, shift] = 1
+            assert possible == (self.maxConsecutiveShifts() or self.consecutiveRestTime())
+            self.x[person, shift] = 0
+        return possible
+    
+    def shiftDelta(self, shift: int, change: int) -> int:
+    # Change in the cost if one person is added (change=1) or removed (change=-1) from a shift
+        covered = self.coverage[shift] + change
+        if change > 0:
+            return -self.N - 1 if covered == 1 else -1
+        return self.N + 1 if covered == 0 else 1
+    
+    def countFlip(self, person: int, shift: int) -> None:
+    # Updates the violation counters for a flip of the cell that is about to happen
+        consecutive, rest = self.flipDelta(person, shift)
+        self.consecutiveViolations += consecutive
+        self.restViolations += rest
+        self.rowConsecutive[person] += consecutive
+        self.rowRest[person] += rest
+        self.dirty[person] = True
+    
+    def setShift(self, person: int, shift: int) -> None:
+    # Gives a shift to a person keeping the violation counters up to date
+        self.countFlip(person, shift)
+        self.objective += self.shiftDelta(shift, 1)
+        self.coverage[shift] += 1
+        self.x[person, shift] = 1
+        if self.bits:
+            self.xRows[person] |= 1 << int(shift)
+    
+    def clearShift(self, person: int, shift: int) -> None:
+    # Takes a shift from a person keeping the violation counters up to date
+        self.countFlip(person, shift)
+        self.objective += self.shiftDelta(shift, -1)
+        self.coverage[shift] -= 1
+        self.x[person, shift] = 0
+        if self.bits:
+            self.xRows[person] &= ~(1 << int(shift))
+    
+    def recount(self) -> None:
+    # Recounts every counter from scratch, needed whenever x is replaced as a whole
+        np.sum(self.x, axis=0, dtype=int, out=self.coverage)
+        self.objective = self.coverageCost(self.coverage)
+        self.rowViolations(self.x, self.prefix, self.rowConsecutive, self.rowRest)
+        self.consecutiveViolations = int(np.sum(self.rowConsecutive))
+        self.restViolations = int(np.sum(self.rowRest))
+        self.dirty[:] = True
+        if self.bits:
+            self.xRows = self.bits.fromArray(self.x)
+    
+    def rowViolations(self, rows: np.ndarray, prefix: np.ndarray, consecutive: np.ndarray, rest: np.ndarray) -> None:
+    # Counts the violated windows of both rules in every row (the last axis of rows) into consecutive and rest
+    # prefix is a scratch buffer shaped like rows with one more column
+        T = rows.shape[-1]
+        S = prefix
+        np.cumsum(rows, axis=-1, out=S[..., 1:])
+        windows = np.arange(max(0, T - self.C - 1))
+        np.sum(S[..., windows + self.C + 1] - S[..., windows] > self.C, axis=-1, out=consecutive)
+        windows = np.arange(max(0, T - self.C - self.D))
+        full = S[..., windows + self.C] - S[..., windows] == self.C
+        busy = S[..., windows + self.C + self.D] - S[..., windows + self.C] > 0
+        np.sum(full & busy, axis=-1, out=rest)
+    
+    def loadSolution(self, x: np.ndarray) -> None:
+    # Replaces x by a solution found elsewhere, with the slots left open by it
+        np.copyto(self.x, x, casting="unsafe")
+        self.recount()
+        np.subtract(self.capacity, self.coverage, out=self.availableShifts)
+    
+    def saveState(self) -> tuple:
+    # Snapshot of x and of the counters and open slots that follow it
+        rows = list(self.xRows) if self.bits else None
+        violations = (self.consecutiveViolations, self.restViolations, np.copy(self.rowConsecutive), np.copy(self.rowRest))
+        return np.copy(self.x), np.copy(self.coverage), self.objective, violations, rows, np.copy(self.availableShifts)
+    
+    def restoreState(self, state: tuple) -> None:
+    # Brings back a snapshot taken with saveState, marking the rows that differ from the current x as dirty
+    # Everything is copied into the solver's own buffers, so the snapshot can be restored again
+        x, coverage, self.objective, violations, rows, available = state
+        np.not_equal(self.x, x, out=self.changed)
+        np.any(self.changed, axis=1, out=self.changedRows)
+        self.dirty |= self.changedRows
+        np.copyto(self.x, x)
+        np.copyto(self.coverage, coverage)
+        np.copyto(self.availableShifts, available)
+        self.consecutiveViolations, self.restViolations = violations[:2]
+        np.copyto(self.rowConsecutive, violations[2])
+        np.copyto(self.rowRest, violations[3])
+        if self.bits:
+            self.xRows = list(rows)
+    
     def resetSolution(self) -> None:
     # Resets the solution to the initial state
-        self.x = np.zeros((len(self.P), len(self.allShifts)), dtype=int)
-        self.requests = np.copy(self.R)
+        self.x[:] = 0
+        self.recount()
+        np.copyto(self.requests, self.R)
         self.remainingRequests = np.count_nonzero(self.R)
         self.remainingShifts = np.sum(self.availableShifts)
-        if self.shifts:
-            self.availableShifts = np.zeros(len(self.allShifts), dtype=int)
-            shifts, shiftCounts = np.unique(self.shifts, return_counts=True) 
-            for shift, count in zip(shifts, shiftCounts):
-                self.availableShifts[self.shiftIndex[shift]] = count 
-        else:
-            self.availableShifts = np.full(len(self.allShifts) , self.N)
-        self.minimum = {p: 0 for p in self.P}
-        self.maximum = {p: 0 for p in self.P}
+        np.copyto(self.availableShifts, self.capacity)
+        self.minimum[:] = 0
+        self.maximum[:] = 0
     
     def randomSchedule(self) -> None:
     # Generates a random schedule that satisfies the constraints
@@ -172,23 +355,101 @@ class RND:
         #         break
         #     self.resetSolution()
         #     self.randomOrder()
-        self.fillRemaining()
-        self.updateY()
+        with phase(self.stats, "construction"):
+            self.fillRemaining()
+            self.updateY()
         return self.cost()
         #self.display()
 
+    def randomSchedules(self, batch: int) -> tuple:
+    # Builds batch independent random schedules at once, returned as (x of shape (batch, P, T), costs)
+    # x and the solver's counters are left untouched
+        with phase(self.stats, "construction"):
+            x = np.zeros((batch, self.peopleNumber, len(self.allShifts)), dtype=np.uint8)
+            costs = self.fillBatch(x)
+        return x, costs
+    
+    def fillBatch(self, x: np.ndarray, people=None) -> np.ndarray:
+    # Completes a batch of schedules of shape (B, P, T) in place and returns their costs
+    # With people (an array of row ids) only those rows get new shifts
+    # Every schedule follows fillRemaining with its own random order of the people: in each round every person
+    # that has requests left (R minus x) and is below MaxShifts draws one of them, which is kept when the
+    # shift has a slot and canAssign would accept it. The schedules are processed side by side, one person
+    # at a time, so the Python work does not grow with B
+        B, P, T = x.shape
+        starts = np.arange(B)
+        requests = np.bitwise_xor(self.R, np.bitwise_and(self.R, x))
+        if people is not None:
+            outside = np.ones(P, dtype=bool)
+            outside[people] = False
+            requests[:, outside] = 0
+        available = self.capacity - np.sum(x, axis=1, dtype=int)
+        maximum = np.sum(x, axis=2, dtype=int, where=self.Tmask) == self.M
+        rowConsecutive = np.zeros((B, P), dtype=int)
+        rowRest = np.zeros((B, P), dtype=int)
+        self.rowViolations(x, np.zeros((B, P, T + 1), dtype=int), rowConsecutive, rowRest)
+        consecutiveViolations = np.sum(rowConsecutive, axis=1)
+        restViolations = np.sum(rowRest, axis=1)
+        order = self.rng.permuted(np.broadcast_to(np.arange(P), (B, P)), axis=1)
+        # Scratch buffers of the loop
+        keys = np.empty((B, T))
+        row = np.empty((B, T), dtype=np.uint8)
+        prefix = np.zeros((B, T + 1), dtype=int)
+        consecutive = np.empty(B, dtype=int)
+        rest = np.empty(B, dtype=int)
+        
+        while True:
+            left = ~maximum & requests.any(axis=2)
+            if not left.any():
+                break
+            for j in range(P):
+                p = order[:, j]
+                active = left[starts, p]
+                if not active.any():
+                    continue
+                # Uniform draw among the requests left: the request with the largest random key
+                own = requests[starts, p]
+                self.rng.random(out=keys)
+                keys[own == 0] = -1
+                t = np.argmax(keys, axis=1)
+                requests[starts[active], p[active], t[active]] = 0
+                if self.stats:
+                    self.stats.count("constraintChecks", int(np.count_nonzero(active)))
+                np.copyto(row, x[starts, p])
+                row[starts, t] = 1
+                self.rowViolations(row, prefix, consecutive, rest)
+                consecutive -= rowConsecutive[starts, p]
+                rest -= rowRest[starts, p]
+                possible = ~((consecutiveViolations + consecutive > 0) & (restViolations + rest > 0))
+                assign = active & (available[starts, t] > 0) & possible
+                b, p, t = starts[assign], p[assign], t[assign]
+                x[b, p, t] = 1
+                available[b, t] -= 1
+                rowConsecutive[b, p] += consecutive[assign]
+                rowRest[b, p] += rest[assign]
+                consecutiveViolations[assign] += consecutive[assign]
+                restViolations[assign] += rest[assign]
+            maximum |= np.sum(x, axis=2, dtype=int, where=self.Tmask) == self.M
+        
+        coverage = np.sum(x, axis=1, dtype=int)
+        return np.sum(np.where(coverage >= 1, self.N - coverage, 2 * self.N), axis=1)
+    
     def updateY(self) -> None:
     # Updates the y array    
-        for t in self.allShifts:
-            self.y[self.shiftIndex[t]] = 1 if sum(self.x[p][self.shiftIndex[t]] for p in range(self.peopleNumber)) >= 1 else 0
+        np.greater_equal(self.coverage, 1, out=self.y)
+    
+    def coverageCost(self, coverage: np.ndarray) -> int:
+    # Returns the cost of a solution given how many people work each shift
+        return int(np.sum(np.where(coverage >= 1, self.N - coverage, 2 * self.N)))
     
     def cost(self) -> int:
     # Returns the cost of the solution
-        return sum(
-            self.N + self.N * (1 - self.y[self.shiftIndex[t]]) - sum(self.x[p][self.shiftIndex[t]] for p in range(self.peopleNumber))
-            for t in self.allShifts
-        )
-     
+        if self.stats:
+            self.stats.count("costEvaluations")
+        if self.validate:
+            assert self.objective == self.coverageCost(np.sum(self.x, axis=0))
+        return self.objective
+    
     def display(self) -> None: 
     # Displays the schedule   
         for p in self.P:
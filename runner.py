@@ -0,0 +1,133 @@
+'''
+  Runs the experiment grid of main.py (months x k_max x max_iter x seeds x variant) in a pool of processes.
+  Every job builds its solvers from a SeedSequence of its own seed, so the results do not depend on the number
+  of workers or on the order in which the jobs finish. The results are merged in the order of the serial loop and
+  written with the same layout as results_all_combinations_seed{seed}.csv.
+  With stats=True the counters, phase times and convergence trace of every job (see stats.SolverStats) are
+  written next to it in results_all_combinations_seed{seed}_stats.json.
+  Every finished job is appended at once to a long-format results store (see results_store.py), and the reports
+  are pivoted from it, so a killed sweep started again skips the jobs already in the store. A job is its
+  (month, k_max, max_iter, seed, variant, adaptive), so a sweep with another adaptive setting runs again, and with
+  stats=True the jobs stored without statistics run again too. A job that raises is reported and not stored, so the
+  other jobs go on and the next sweep retries it. With checkpoint_dir every running search also checkpoints
+  itself there every CHECKPOINT_SECONDS and resumes from it.
+  Durations of resumed searches only count the time since the restart.
+'''
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
+from time import time
+
+import numpy as np
+
+from bound import lower_bound
+from checkpoint import CheckpointSettings
+from instance_cache import load_month
+from instances import build_solver
+from results_store import ResultsStore, job_key, report
+from stopping import StopCriteria
+
+CHECKPOINT_SECONDS = 60
+
+def job_stats(job, vns):
+# Statistics of a finished job, or None when they were not collected
+    if not vns.stats:
+        return None
+    mes, k_max, max_iter, seed, variant, adaptive = job
+    info = {"month": mes, "k_max": k_max, "max_iter": max_iter, "seed": seed, "variant": variant, "adaptive": adaptive}
+    info["stopReason"] = vns.stopReason
+    info.update(vns.stats.toDict())
+    return info
+
+def job_name(job) -> str:
+    mes, k_max, max_iter, seed, variant, adaptive = job
+    return f"{mes}_k{k_max}_i{max_iter}_s{seed}_{variant}" + (f"_{adaptive}" if adaptive else "")
+
+def solve_job(job, stats=False, checkpoint=None):
+# Runs one cell of the grid and returns its record (see results_store)
+    mes, k_max, max_iter, seed, variant, adaptive = job
+    restrictions, people_dict = load_month(mes)
+    stream = np.random.SeedSequence(seed)
+    options = {"adaptive": adaptive}
+    if checkpoint:
+        options["checkpoint"] = CheckpointSettings(checkpoint, seconds=CHECKPOINT_SECONDS, resume=True)
+    start = time()
+    vns = build_solver(restrictions, people_dict, variant, stream, stats=stats)
+    bound = lower_bound(vns)
+    initial = vns.objective if variant == "VNS_R" else vns.grdCost()
+    cost = vns.vns(k_max, max_iter, StopCriteria(lower_bound=bound), **options)
+    end = time() - start
+    return {
+        "month": mes,
+        "variant": variant,
+        "seed": seed,
+        "k_max": k_max,
+        "max_iter": max_iter,
+        "adaptive": adaptive,
+        "people": len(restrictions["People"]),
+        "shifts": len(restrictions["Shifts"]),
+        "min_shifts": restrictions["MinShifts"],
+        "lower_bound": int(bound),
+        "start_cost": int(initial),
+        "cost": int(cost),
+        "duration": end,
+        "stop_reason": vns.stopReason,
+        "stats": job_stats(job, vns),
+    }
+
+def run_job(job, stats=False, checkpoint_dir=None):
+# solve_job with the search checkpointed in checkpoint_dir while it runs
+    if checkpoint_dir is None:
+        return solve_job(job, stats)
+    search = os.path.join(checkpoint_dir, job_name(job) + ".npz")
+    record = solve_job(job, stats, search)
+    os.remove(search)
+    return record
+
+def grid_jobs(meses, k_max_values, max_iter_values, seed, adaptive=None):
+# Jobs of one seed in the order of the serial loop of main.py
+    return [
+        (mes, k_max, max_iter, seed, variant, adaptive)
+        for mes in meses
+        for k_max in k_max_values
+        for max_iter in max_iter_values
+        for variant in ("VNS_R", "VNS_G")
+    ]
+
+def run_grid(meses, k_max_values, max_iter_values, seeds, workers=None, path="results_all_combinations_seed{seed}.csv", stats=False, adaptive=None, checkpoint_dir=None, store="results_long.csv"):
+# Runs the jobs of the grid missing from the store, appending each one as it finishes, and writes one report per seed
+    workers = workers or os.cpu_count() or 1
+    jobs = {seed: grid_jobs(meses, k_max_values, max_iter_values, seed, adaptive) for seed in seeds}
+    results = ResultsStore(store)
+    finished = results.finished(stats)
+    pending = [job for seed in seeds for job in jobs[seed] if job not in finished]
+    solve = partial(run_job, stats=stats, checkpoint_dir=checkpoint_dir)
+    failed = []
+    if workers == 1:
+        for job in pending:
+            try:
+                results.append(solve(job))
+            except Exception as error:
+                failed.append((job, error))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(solve, job): job for job in pending}
+            for future in as_completed(futures):
+                try:
+                    results.append(future.result())
+                except Exception as error:
+                    failed.append((futures[future], error))
+    for job, error in failed:
+        print(f"Job {job_name(job)} failed: {error!r}")
+
+    records = {job_key(record): record for record in results.records()}
+    frames = {}
+    for seed in seeds:
+        frames[seed] = report(records.values(), seed, jobs[seed])
+        frames[seed].to_csv(path.format(seed=seed))
+        if stats:
+            infos = [records[job]["stats"] for job in jobs[seed] if job in records and records[job]["stats"]]
+            with open(os.path.splitext(path.format(seed=seed))[0] + "_stats.json", "w") as file:
+                json.dump(infos, file)
+    return frames
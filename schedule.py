@@ -8,6 +8,8 @@
         Requests (set): A set of shifts the person wants to work.
     vacant (list): A list of available shifts.
 '''
+from shift_codec import M, T, D, N, shift_code
+
 class Schedule:
   
   def __init__(self, people, vacancies):
@@ -19,57 +21,90 @@ class Schedule:
     self.allShifts = sorted(self.allShifts, key=shift_sort_key)
 
 # Heuristica de geração de escala
+# Shifts are encoded once as 4 * day + period (M, T, D, N); vacancies are kept as counts per code and
+# each person's schedule and consecutive counter as arrays indexed by code
   def generateSchedule(self):
     people = sorted(self.people.keys(), key=lambda p: self.people[p]["Priority"])
+    vacancies = [shift_code(shift) for shift in self.vacancies]
+    requests = {p: [shift_code(shift) for shift in self.people[p]["Requests"]] for p in people}
+    # One spare day so the day after the last shift can be looked up
+    size = max(vacancies + [code for codes in requests.values() for code in codes], default=0) + 8
+    self.vacant = [0] * size
+    for code in vacancies:
+      self.vacant[code] += 1
+    remaining = len(vacancies)
+    self.working = {p: [0] * size for p in people}
+    self.counter = {p: [None] * size for p in people}
+    for p in people:
+      for shift, count in self.consecutive_counter[p].items():
+        self.counter[p][shift_code(shift)] = count
+    taken = [0] * size
     request_indices = {p: 0 for p in people}
-    count = 0
-    while count < len(people):
-      for p in people:
-        if not self.vacancies:
+    active = [p for p in people if requests[p]]
+    while active and remaining:
+      for p in active:
+        if not remaining:
           break
-        while request_indices[p] < len(self.people[p]["Requests"]):
-          shift = self.people[p]["Requests"][request_indices[p]]
-          if shift in self.vacancies and not self.conflict(self.schedule[p], shift, p):
-            self.schedule[p].append(shift)
-            self.vacancies.remove(shift)
-            request_indices[p] += 1
-            break
+        codes = requests[p]
+        while request_indices[p] < len(codes):
+          code = codes[request_indices[p]]
           request_indices[p] += 1
-        else:
-          request_indices[p] = len(self.people[p]["Requests"])
-      count = sum([1 if request_indices[p] == len(self.people[p]["Requests"]) else 0 for p in people])
+          if self.vacant[code] and not self.conflict(p, code):
+            self.schedule[p].append(self.people[p]["Requests"][request_indices[p] - 1])
+            self.working[p][code] += 1
+            self.vacant[code] -= 1
+            taken[code] += 1
+            remaining -= 1
+            break
+      active = [p for p in active if request_indices[p] < len(requests[p])]
+
+    # Same vacancies list as removing the first occurrence of every assigned shift
+    left = []
+    for shift, code in zip(self.vacancies, vacancies):
+      if taken[code]:
+        taken[code] -= 1
+      else:
+        left.append(shift)
+    self.vacancies[:] = left
+    for p in people:
+      for shift in self.consecutive_counter[p]:
+        self.consecutive_counter[p][shift] = self.counter[p][shift_code(shift)]
 
 # Checagem de restrições        
-  def conflict(self, schedule, new_shift, p):
-    if len(schedule) == self.people[p]["MaxShifts"]:
+  def conflict(self, p, code):
+    if len(self.schedule[p]) == self.people[p]["MaxShifts"]:
       return True
-    matches = {shiftPeriod: f"{int(new_shift[:-1])}{shiftPeriod}" in schedule for shiftPeriod in ['D', 'T', 'M']}
-    shiftPeriod = new_shift[-1]
-    if matches['D'] and (shiftPeriod == 'M' or shiftPeriod == 'T'):
+    working = self.working[p]
+    day, period = code & ~3, code & 3
+    if working[day + D] and (period == M or period == T):
       return True
-    elif (matches['T'] or matches['M']) and shiftPeriod == 'D':
+    elif (working[day + T] or working[day + M]) and period == D:
       return True
-    return self.consecutiveLimit(new_shift, p)
+    return self.consecutiveLimit(p, code)
   
-  def consecutiveLimit(self, new_shift, p):
-    new_date, new_shiftPeriod = int(new_shift[:-1]), new_shift[-1]
+  def consecutiveLimit(self, p, code):
+    counter, working = self.counter[p], self.working[p]
+    day, period = code & ~3, code & 3
+    neighbours = [day + other for other in (M, T, D, N) if other != period]
+    if period == N:
+      neighbours.append(day + 4 + D)
+    elif period == D and day:
+      neighbours.append(day - 4 + N)
     consecutives = []
-    for shift, count in self.consecutive_counter[p].items():
-      date, shiftPeriod = int(shift[:-1]), shift[-1]
-      if (date == new_date and shiftPeriod != new_shiftPeriod) or \
-         (date == new_date + 1 and shiftPeriod == 'D' and new_shiftPeriod == 'N') or \
-         (date == new_date - 1 and shiftPeriod == 'N' and new_shiftPeriod == 'D'):
-          if count == 1:
-            self.consecutive_counter[p][new_shift] = -1
-            return True
-          if shift in self.schedule[p]:
-            consecutives.append(shift)
+    for shift in neighbours:
+      if counter[shift] is None:
+        continue
+      if counter[shift] == 1:
+        counter[code] = -1
+        return True
+      if working[shift]:
+        consecutives.append(shift)
     if len(consecutives) == 2:
-      self.consecutive_counter[p][new_shift] = -1
+      counter[code] = -1
       return True
     for shift in consecutives:
-      self.consecutive_counter[p][shift] += 1
-    self.consecutive_counter[p][new_shift] = len(consecutives)
+      counter[shift] += 1
+    counter[code] = len(consecutives)
     return False
 
 # Funções de exibição   
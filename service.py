@@ -0,0 +1,225 @@
+'''
+  Local roster-solving service: an asyncio HTTP front end (TCP or Unix socket) with a job queue, dispatching to a
+  pool of worker processes that already imported and exercised the solvers, so a small solve does not pay for
+  starting Python, importing numpy/pandas and warming up.
+    python service.py --port 8765 --workers 4
+    python service.py --unix /tmp/roster.sock
+  Endpoints (JSON in and out):
+    POST /jobs: queues a job and answers {"id", "status"}, or waits for the result with ?wait=1.
+      month (int): yyyymm, for the number of days and the default MinShifts.
+      people (list): The people as in Dados/{month}.json ({"nome", "dias"}).
+      shifts (list): The month's shifts as in Dados/month_data.json.
+      variant ("VNS_G" | "VNS_R"), k_max, max_iter, seed, min_shifts (optional).
+      time_limit (float, optional): Seconds of VNS, the job's time budget. max_iter may then be null.
+    GET /jobs/{id}: status ("queued", "running", "done", "cancelled", "failed") and, when done,
+      cost, schedule ({name: [shifts]}), stopReason and seconds.
+    DELETE /jobs/{id}: cancels a queued job, or stops a running one at its next step (stopReason "cancelled"),
+      keeping the best roster it found.
+    GET /health: workers and jobs queued and running.
+'''
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import count
+from urllib.parse import parse_qs, urlsplit
+
+from instances import build_solver, month_min, month_restrictions, people_priorities
+from stopping import StopCriteria
+
+KEEP_FINISHED = 1000
+
+_flags = None
+
+def _warm(flags) -> None:
+# Pool initializer: keeps the cancellation flags and runs a tiny solve so the first job starts warm
+    global _flags
+    _flags = flags
+    people = [{"nome": f"P{i}", "dias": f"{i + 1}D {i + 2}N {i + 8}D"} for i in range(4)]
+    shifts = [f"{day}{period}" for day in range(1, 13) for period in "DN"]
+    solve({"month": 202506, "people": people, "shifts": shifts, "k_max": 3, "max_iter": 1}, None)
+
+def _ping() -> int:
+    time.sleep(0.05)
+    return os.getpid()
+
+def solve(request: dict, slot) -> dict:
+# Runs one job in a worker; slot is the index of its cancellation flag
+    start = time.perf_counter()
+    mes = int(request["month"])
+    people = {item["nome"]: item["dias"].split() for item in request["people"]}
+    restrictions = month_restrictions(mes, people, request["shifts"], request.get("min_shifts", month_min.get(mes, 5)))
+    seed = request.get("seed", 0)
+    vns = build_solver(restrictions, people_priorities(people), request.get("variant", "VNS_G"), seed)
+
+    def cancelled():
+        return slot is not None and bool(_flags[slot])
+
+    stop = StopCriteria(time_limit=request.get("time_limit"), cancelled=cancelled)
+    cost = vns.vns(request.get("k_max", 10), request.get("max_iter", 10), stop)
+    schedule = {str(p): [str(vns.allShifts[t]) for t in vns.x[vns.peopleIndex[p]].nonzero()[0]] for p in vns.P}
+    return {
+        "cost": int(cost),
+        "schedule": {p: schedule[p] for p in people},
+        "stopReason": vns.stopReason,
+        "seconds": time.perf_counter() - start,
+    }
+
+class Job:
+    def __init__(self, id: int, request: dict) -> None:
+        self.id = id
+        self.request = request
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.slot = None
+        self.done = asyncio.Event()
+
+    def toDict(self) -> dict:
+        info = {"id": self.id, "status": self.status}
+        if self.result:
+            info.update(self.result)
+        if self.error:
+            info["error"] = self.error
+        return info
+
+class RosterService:
+    def __init__(self, workers=None) -> None:
+        self.workers = workers or os.cpu_count() or 1
+        self.flags = multiprocessing.Array("b", self.workers, lock=False)
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_warm, initargs=(self.flags,))
+        self.queue = asyncio.Queue()
+        self.jobs = OrderedDict()
+        self.ids = count(1)
+        self.dispatchers = []
+
+    async def start(self) -> None:
+    # Starts every worker process before the first job arrives
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.pool, _ping) for _ in range(self.workers)))
+        self.dispatchers = [asyncio.create_task(self.dispatch(slot)) for slot in range(self.workers)]
+
+    async def close(self) -> None:
+        for task in self.dispatchers:
+            task.cancel()
+        self.pool.shutdown(cancel_futures=True)
+
+    def submit(self, request: dict) -> Job:
+        job = Job(next(self.ids), request)
+        self.jobs[job.id] = job
+        self.queue.put_nowait(job)
+        return job
+
+    def cancel(self, job: Job) -> None:
+        if job.status == "queued":
+            job.status = "cancelled"
+            job.done.set()
+        elif job.status == "running":
+            self.flags[job.slot] = 1
+
+    async def dispatch(self, slot: int) -> None:
+    # Runs the queued jobs one at a time on one worker, which owns cancellation flag slot
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self.queue.get()
+            if job.status != "queued":
+                continue
+            job.status, job.slot = "running", slot
+            self.flags[slot] = 0
+            try:
+                job.result = await loop.run_in_executor(self.pool, solve, job.request, slot)
+                job.status = "cancelled" if job.result["stopReason"] == "cancelled" else "done"
+            except Exception as error:
+                job.status, job.error = "failed", repr(error)
+            job.done.set()
+            self.forget()
+
+    def forget(self) -> None:
+    # Drops the oldest finished jobs beyond KEEP_FINISHED
+        finished = [id for id, job in self.jobs.items() if job.done.is_set()]
+        for id in finished[:max(0, len(finished) - KEEP_FINISHED)]:
+            del self.jobs[id]
+
+    async def handle(self, method: str, target: str, body: bytes) -> tuple:
+    # Returns (HTTP status, JSON answer) of one request
+        url = urlsplit(target)
+        parts = [part for part in url.path.split("/") if part]
+        if parts == ["health"] and method == "GET":
+            running = sum(job.status == "running" for job in self.jobs.values())
+            return 200, {"workers": self.workers, "queued": self.queue.qsize(), "running": running}
+        if parts == ["jobs"] and method == "POST":
+            try:
+                request = json.loads(body)
+            except ValueError:
+                return 400, {"error": "the body is not JSON"}
+            missing = [key for key in ("month", "people", "shifts") if key not in request]
+            if missing:
+                return 400, {"error": f"missing {', '.join(missing)}"}
+            job = self.submit(request)
+            if parse_qs(url.query).get("wait", ["0"])[0] not in ("0", ""):
+                await job.done.wait()
+                return 200, job.toDict()
+            return 202, job.toDict()
+        if len(parts) == 2 and parts[0] == "jobs":
+            job = self.jobs.get(int(parts[1])) if parts[1].isdigit() else None
+            if job is None:
+                return 404, {"error": "no such job"}
+            if method == "GET":
+                return 200, job.toDict()
+            if method == "DELETE":
+                self.cancel(job)
+                return 200, job.toDict()
+        return 404, {"error": "not found"}
+
+    async def serve(self, reader, writer) -> None:
+    # Minimal HTTP/1.1: one request per connection, with a Content-Length body
+        try:
+            method, target, _ = (await reader.readline()).decode().split(" ", 2)
+            length = 0
+            while True:
+                line = (await reader.readline()).decode().strip()
+                if not line:
+                    break
+                name, _, value = line.partition(":")
+                if name.lower() == "content-length":
+                    length = int(value)
+            body = await reader.readexactly(length)
+            status, answer = await self.handle(method, target, body)
+        except (ValueError, asyncio.IncompleteReadError):
+            status, answer = 400, {"error": "bad request"}
+        payload = json.dumps(answer).encode()
+        writer.write(
+            f"HTTP/1.1 {status} {'OK' if status < 400 else 'Error'}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode()
+            + payload
+        )
+        await writer.drain()
+        writer.close()
+
+async def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="serve on this Unix socket instead of TCP")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    service = RosterService(args.workers)
+    await service.start()
+    if args.unix:
+        server = await asyncio.start_unix_server(service.serve, path=args.unix)
+    else:
+        server = await asyncio.start_server(service.serve, args.host, args.port)
+    print(f"serving with {service.workers} warm workers", flush=True)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
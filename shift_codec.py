@@ -0,0 +1,45 @@
+'''
+  Integer encoding of the shifts ("12D", "3N", ...) shared by Schedule, RND and VNS2.
+  Every shift string is parsed once into a code 4 * day + period, with periods ordered M, T, D, N so that
+  sorting codes is the same as sorting with schedule.shift_sort_key. The x/R matrices of RND only have the
+  D and N periods of each day, and matrix_index maps codes to their columns (day - 1) * 2 + (0 for D, 1 for N),
+  raising ValueError for the M and T shifts those matrices cannot hold.
+'''
+import numpy as np
+
+M, T, D, N = 0, 1, 2, 3
+PERIODS = {'M': M, 'T': T, 'D': D, 'N': N}
+LETTERS = "MTDN"
+MATRIX_PERIODS = (D, N)
+
+def shift_code(shift: str) -> int:
+    return 4 * int(shift[:-1]) + PERIODS[shift[-1]]
+
+def encode(shifts) -> np.ndarray:
+# Codes of a list of shift strings
+    return np.array([shift_code(s) for s in shifts], dtype=np.int16)
+
+def decode(codes) -> list:
+# Shift strings of a list of codes
+    return [f"{int(c) >> 2}{LETTERS[int(c) & 3]}" for c in codes]
+
+def matrix_index(codes) -> np.ndarray:
+# Columns of x/R for the codes, which must all be D or N shifts of a day >= 1
+    codes = np.asarray(codes, dtype=np.int16)
+    day, period = (codes >> 2) - 1, codes & 3
+    bad = (day < 0) | ((period != D) & (period != N))
+    if np.any(bad):
+        raise ValueError(f"shifts {decode(codes[bad])} have no column in x/R, which only hold D and N shifts")
+    return (day * 2 + (period == N)).astype(np.int16)
+
+def matrix_codes(month_days: int) -> np.ndarray:
+# Codes of the columns of x/R, the inverse of matrix_index
+    days = np.repeat(np.arange(1, month_days + 1, dtype=np.int16), 2)
+    periods = np.tile(np.array(MATRIX_PERIODS, dtype=np.int16), month_days)
+    return (days * 4 + periods).astype(np.int16)
+
+def encode_people(people: dict) -> tuple:
+# Flattens {name: [shift strings]} into (row, column) arrays of the request matrix
+    rows = np.repeat(np.arange(len(people), dtype=np.int32), [len(shifts) for shifts in people.values()])
+    columns = matrix_index(encode([s for shifts in people.values() for s in shifts]))
+    return rows, columns
@@ -0,0 +1,50 @@
+'''
+  Counters, phase timers and convergence trace of a solver run, switched on with stats=True in RND, VNS and VNS2.
+  Attributes:
+    counters (dict): How many times each hot path ran (constraintChecks, possibleWorkDaysUpdates, moves,
+      improvingMoves, costEvaluations, localMoves).
+    phases (dict): Seconds spent in each phase (construction, shake, repair, localSearch, evaluation).
+    trace (list): One (elapsed_s, k, best_cost) entry per neighbourhood evaluated by vns().
+    adaptive (dict): Arms, usage and learned weights of the adaptive controller, when vns() ran with one.
+'''
+from contextlib import contextmanager, nullcontext
+from time import perf_counter
+
+class SolverStats:
+    def __init__(self) -> None:
+        self.counters = {
+            "constraintChecks": 0,
+            "possibleWorkDaysUpdates": 0,
+            "moves": 0,
+            "improvingMoves": 0,
+            "costEvaluations": 0,
+            "localMoves": 0,
+        }
+        self.phases = {"construction": 0.0, "shake": 0.0, "repair": 0.0, "localSearch": 0.0, "evaluation": 0.0}
+        self.trace = []
+        self.adaptive = None
+
+    def count(self, name: str, amount=1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    @contextmanager
+    def phase(self, name: str):
+    # Adds the time spent inside the with block to the phase
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + perf_counter() - start
+
+    def record(self, elapsed: float, k: int, best_cost: int) -> None:
+        self.trace.append((round(elapsed, 6), int(k), int(best_cost)))
+
+    def toDict(self) -> dict:
+        info = {"counters": dict(self.counters), "phases": dict(self.phases), "trace": list(self.trace)}
+        if self.adaptive is not None:
+            info["adaptive"] = self.adaptive
+        return info
+
+def phase(stats, name: str):
+# Timer for a phase that does nothing when stats are off
+    return stats.phase(name) if stats else nullcontext()
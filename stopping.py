@@ -0,0 +1,46 @@
+'''
+  Stop criteria of VNS.vns besides max_iter, checked before every step. The best solution found is kept in
+  every case and the criterion that stopped the search is left in VNS.stopReason.
+  Attributes:
+    time_limit (float): Seconds the search may run, counted from the start of vns (and across a resume).
+    target_cost (int): Stops once the best cost is at most this.
+    max_no_improve (int): Stops after this many steps in a row without improvement.
+    lower_bound (int): Stops once the best cost reaches this bound (see bound.lower_bound), which proves it optimal.
+    cancelled (callable): Returns True once the caller wants the search stopped, polled with the other criteria
+      and inside the local search.
+'''
+
+class StopCriteria:
+    def __init__(self, time_limit=None, target_cost=None, max_no_improve=None, lower_bound=None, cancelled=None) -> None:
+        self.time_limit = time_limit
+        self.target_cost = target_cost
+        self.max_no_improve = max_no_improve
+        self.lower_bound = lower_bound
+        self.cancelled = cancelled
+
+    def bounded(self) -> bool:
+    # Whether some criterion always ends a search run with max_iter=None. A lower bound is usually not reachable
+        return self.time_limit is not None or self.target_cost is not None or self.max_no_improve is not None
+
+    def optimal(self, best_cost: int) -> bool:
+        return self.lower_bound is not None and best_cost <= self.lower_bound
+
+    def interrupted(self, elapsed: float) -> bool:
+    # Whether a step still running has to stop, which only the time limit and cancellation can say halfway through it
+        if self.cancelled is not None and self.cancelled():
+            return True
+        return self.time_limit is not None and elapsed >= self.time_limit
+
+    def reason(self, best_cost: int, elapsed: float, stale: int):
+    # The criterion that stops the search now, or None
+        if self.cancelled is not None and self.cancelled():
+            return "cancelled"
+        if self.optimal(best_cost):
+            return "lower_bound"
+        if self.time_limit is not None and elapsed >= self.time_limit:
+            return "time_limit"
+        if self.target_cost is not None and best_cost <= self.target_cost:
+            return "target_cost"
+        if self.max_no_improve is not None and stale >= self.max_no_improve:
+            return "max_no_improve"
+        return None
@@ -0,0 +1,58 @@
+'''
+  Seeded generator of synthetic instances in the Dados JSON schema, to see how the solvers scale beyond the real
+  months. A horizon of several months is numbered as one long month (days 1 to 30 * months).
+  The proportions follow the real months: every person asks for a block of weekdays and a few scattered shifts,
+  and there are about 1.7 slots per shift for every 11 people.
+'''
+import json
+
+import numpy as np
+
+def generate(people: int, months=1, seed=0) -> tuple:
+# Returns (people list as in Dados/{month}.json, shift list as in Dados/month_data.json, number of days)
+    rng = np.random.default_rng(seed)
+    days = 30 * months
+    shifts = [f"{day}{period}" for day in range(1, days + 1) for period in ("D", "N")]
+
+    data = []
+    for i in range(people):
+        weekdays = rng.choice(7, size=rng.integers(1, 4), replace=False)
+        periods = rng.choice(["D", "N"], size=len(weekdays))
+        requested = [f"{day}{period}" for weekday, period in zip(weekdays, periods) for day in range(weekday + 1, days + 1, 7)]
+        requested += list(rng.choice(shifts, size=rng.integers(0, 4 * months + 1), replace=False))
+        requested = list(dict.fromkeys(requested))
+        rng.shuffle(requested)
+        data.append({"nome": f"Pessoa{i:04d}", "dias": " ".join(requested)})
+
+    mean = 1.7 * people / 11
+    slots = np.maximum(1, rng.poisson(mean, size=len(shifts)))
+    vacancies = [shift for shift, count in zip(shifts, slots) for _ in range(count)]
+    return data, vacancies, days
+
+def restrictions(people: int, months=1, seed=0) -> tuple:
+# Restrictions and Schedule inputs of a synthetic instance, with the constants used for the real months
+# and MaxPeoplePerShift scaled with the number of slots
+    data, vacancies, days = generate(people, months, seed)
+    requests = {item["nome"]: item["dias"].split() for item in data}
+    restrictions = {
+        "People": requests,
+        "Shifts": vacancies,
+        "MaxPeoplePerShift": max(2, round(len(vacancies) / (2 * days))),
+        "MinShifts": 5,
+        "MaxShifts": 10 * months,
+        "MaxConsecutiveShifts": 1,
+        "ConsecutiveRestTime": 6,
+        "MonthDays": days,
+    }
+    people_dict = {
+        p: {"Priority": c, "Requests": requests[p], "MaxShifts": 10 * months}
+        for c, p in enumerate(requests)
+    }
+    return restrictions, people_dict
+
+def write(path: str, people: int, months=1, seed=0) -> list:
+# Writes the people file of a synthetic instance and returns its shift list
+    data, vacancies, _ = generate(people, months, seed)
+    with open(path, "w") as file:
+        json.dump(data, file, indent=2)
+    return vacancies
@@ -1,13 +1,30 @@
 import numpy as np
+from time import process_time, time
+import checkpoint as checkpoints
+from adaptive import NeighbourhoodController
 from rnd_h import RND
+from stats import phase
+from stopping import StopCriteria
+
+# Most (a, s) pairs one chainMove call tries
+CHAIN_SCAN = 256
 
 class  VNS(RND):
-    def __init__(self, restrictions, seed=0):
+    def __init__(self, restrictions, seed=0, validate=False, bitset=False, stats=False):
     # Initialize the VNS class
-        super().__init__(restrictions, seed)
-        self.possibleWorkDays = None
-        self.notPossible = np.array([[1 for t in self.allShifts]for p in self.P])
+        super().__init__(restrictions, seed, validate, bitset, stats)
+        self.possibleWorkDays = np.zeros(self.x.shape, dtype=np.uint8)
+        self.notPossible = np.ones(self.x.shape, dtype=np.uint8)
+        # Scratch row of updatePossibleWorkDays
+        self.intersect = np.zeros(len(self.allShifts), dtype=np.uint8)
         self.xRnd = None
+        self.rowKeys = [None] * self.peopleNumber
+        self.stopReason = None
+        self.controller = None
+        # People the sequential step may shake and repair (array of row ids), None for everyone
+        self.focus = None
+        # (StopCriteria, start time) of the running vns, polled by the local search
+        self.running = None
     
     def getPersonById(self, id: int) -> str:
     # Find a person's name by their id
@@ -16,38 +33,62 @@ class  VNS(RND):
     
     def updatePossibleWorkDays(self, person: int) -> None:
     # Update the possible work days for a person
-        intersect = np.bitwise_and(self.R[person], self.x[person])
-        self.possibleWorkDays[person] = np.bitwise_xor(self.R[person], intersect)
-        self.possibleWorkDays[person] = np.bitwise_and(self.possibleWorkDays[person], self.notPossible[person])  
-        indices = np.where(self.possibleWorkDays[person] == 1)[0]
+        if self.stats:
+            self.stats.count("possibleWorkDaysUpdates")
+        if self.bits:
+            possible = self.rRows[person] & ~self.xRows[person]
+            possible = [shift for shift in self.bits.indices(possible) if self.canAssign(person, shift)]
+            self.possibleWorkDays[person] = 0
+            self.possibleWorkDays[person, possible] = 1
+            self.remainingRequests = np.count_nonzero(self.possibleWorkDays)
+            self.cleanRow(person)
+            return
+        row = self.possibleWorkDays[person]
+        np.bitwise_and(self.R[person], self.x[person], out=self.intersect)
+        np.bitwise_xor(self.R[person], self.intersect, out=row)
+        np.bitwise_and(row, self.notPossible[person], out=row)
+        indices = np.flatnonzero(row)
         for shift in indices:
-            self.x[person, shift] = 1
-            if not self.maxConsecutiveShifts() and not self.consecutiveRestTime(): 
-                self.possibleWorkDays[person, shift] = 0
-            self.x[person, shift] = 0
-        self.remainingRequests = np.sum(self.possibleWorkDays)
+            if not self.canAssign(person, shift):
+                row[shift] = 0
+        self.remainingRequests = np.count_nonzero(self.possibleWorkDays)
+        self.cleanRow(person)
+    
+    def rowKey(self, person: int) -> tuple:
+    # Whether the other rows already violate each rule, the only outside input of a row's possible work days
+        return (self.consecutiveViolations - self.rowConsecutive[person] > 0, self.restViolations - self.rowRest[person] > 0)
+    
+    def cleanRow(self, person: int) -> None:
+    # Marks the possible work days of a person as up to date
+        self.rowKeys[person] = self.rowKey(person)
+        self.dirty[person] = False
     
     def removeImpossibleShifts(self) -> None:
-    # Update the possible work days for all people    
+    # Update the possible work days of the people whose rows changed since the last rebuild
         for p in range(self.peopleNumber):
-            self.updatePossibleWorkDays(p)
+            if self.dirty[p] or self.rowKeys[p] != self.rowKey(p):
+                self.updatePossibleWorkDays(p)
+        self.remainingRequests = np.count_nonzero(self.possibleWorkDays)
     
     def resetVns(self) -> None:
     # Reset the variables for the vsn algorithm
         self.removeImpossibleShifts()
-        self.requests = np.copy(self.possibleWorkDays)
+        np.copyto(self.requests, self.possibleWorkDays)
+        if self.focus is not None:
+            outside = np.ones(self.peopleNumber, dtype=bool)
+            outside[self.focus] = False
+            self.requests[outside] = 0
         self.remainingShifts = np.sum(self.availableShifts)
-        self.minimum = {p: 0 for p in self.P}
-        self.maximum = {p: 0 for p in self.P}
+        self.minimum[:] = 0
+        self.maximum[:] = 0
         self.updateMinMax()
         self.randomOrder()
     
     def removeShifts(self, id: int) -> None:      
     # Remove a shift from a person    
-        days = np.where(self.x[id] == 1)[0]
-        if days.size == 0: return
-        remove = np.random.choice(days)
-        self.x[id][remove] = 0
+        if not self.x[id].any(): return
+        remove = self.pickCell(self.x[id])
+        self.clearShift(id, remove)
         self.availableShifts[remove] += 1
         self.updatePossibleWorkDays(id)
         return remove
@@ -57,37 +98,336 @@ class  VNS(RND):
         self.resetVns()
         self.fillRemaining()
     
-    def vns(self, kmax: int, max_iter: int) -> None:
+    def tryMove(self, removals: tuple, additions: tuple) -> bool:
+    # Applies the flips if they lower the cost and keep the slots, MaxShifts and the rule of canAssign,
+    # otherwise undoes them. Only the windows around the flipped cells are recounted
+        before = self.objective
+        for p, t in removals:
+            self.clearShift(p, t)
+            self.availableShifts[t] += 1
+        for p, t in additions:
+            self.setShift(p, t)
+            self.availableShifts[t] -= 1
+        accepted = (
+            self.objective < before
+            and not (self.consecutiveViolations > 0 and self.restViolations > 0)
+            and all(self.availableShifts[t] >= 0 and np.sum(self.x[p], dtype=int, where=self.Tmask) <= self.M for p, t in additions)
+        )
+        if self.stats:
+            self.stats.count("constraintChecks")
+        if not accepted:
+            for p, t in reversed(additions):
+                self.clearShift(p, t)
+                self.availableShifts[t] += 1
+            for p, t in reversed(removals):
+                self.setShift(p, t)
+                self.availableShifts[t] -= 1
+        return accepted
+    
+    def openShifts(self) -> np.ndarray:
+    # Shifts with a free slot, uncovered ones first as they gain the most
+        open = np.flatnonzero(self.availableShifts > 0)
+        return open[np.argsort(self.coverage[open], kind="stable")]
+    
+    def wants(self) -> np.ndarray:
+    # (person, shift) cells of the requests not worked, only in the rows of self.focus when it is set
+        wants = self.R > self.x
+        if self.focus is not None:
+            outside = np.ones(self.peopleNumber, dtype=bool)
+            outside[self.focus] = False
+            wants[outside] = False
+        return wants
+    
+    def interrupted(self) -> bool:
+    # Whether the stop criteria of the running vns end it now, checked between the moves of localSearch
+        return self.running is not None and self.running[0].interrupted(time() - self.running[1])
+    
+    def fillMove(self) -> bool:
+    # Gives a free slot to someone who asked for it and is below MaxShifts
+        takers = self.wants() & (self.workedShifts() < self.M)[:, np.newaxis]
+        for t in self.openShifts():
+            for b in np.flatnonzero(takers[:, t]):
+                if self.canAssign(b, t) and self.tryMove((), ((b, t),)):
+                    return True
+        return False
+    
+    def relocateMove(self) -> bool:
+    # Moves one shift of a person to an uncovered shift the same person asked for, from a shift that stays covered
+        wants = self.wants()
+        for t in self.openShifts():
+            if self.coverage[t] > 0:
+                break
+            for b in np.flatnonzero(wants[:, t]):
+                for s in np.flatnonzero(self.x[b]):
+                    if self.coverage[s] > 1 and self.tryMove(((b, s),), ((b, t),)):
+                        return True
+        return False
+    
+    def chainMove(self) -> bool:
+    # Ejection chain: a takes a free slot and hands one of its shifts over to c, so that shift keeps its coverage
+    # a's half of the chain is applied once for every c tried, since adding c's shift never removes a violation
+    # The candidates are found once per call, as a's half only changes a's row, and at most CHAIN_SCAN (a, s)
+    # pairs are tried, the uncovered open shifts first
+        wants = self.wants()
+        takers = wants & (self.workedShifts() < self.M)[:, np.newaxis]
+        handable = takers.any(axis=0)
+        tries = 0
+        for t in self.openShifts():
+            if self.interrupted():
+                return False
+            for a in np.flatnonzero(wants[:, t]):
+                for s in np.flatnonzero(self.x[a] & handable):
+                    if tries == CHAIN_SCAN:
+                        return False
+                    tries += 1
+                    self.clearShift(a, s)
+                    self.setShift(a, t)
+                    self.availableShifts[s] += 1
+                    self.availableShifts[t] -= 1
+                    if not (self.consecutiveViolations > 0 and self.restViolations > 0):
+                        for c in np.flatnonzero(takers[:, s]):
+                            if c != a and self.canAssign(c, s) and self.tryMove((), ((c, s),)):
+                                return True
+                    self.clearShift(a, t)
+                    self.setShift(a, s)
+                    self.availableShifts[s] -= 1
+                    self.availableShifts[t] += 1
+        return False
+    
+    def localSearch(self) -> int:
+    # Variable neighbourhood descent over fillMove, relocateMove and chainMove, going back to the first
+    # neighbourhood after every improving move, and returns the number of moves applied
+    # Inside vns it stops between moves once the stop criteria say so (see interrupted)
+        neighbourhoods = (self.fillMove, self.relocateMove, self.chainMove)
+        moves = 0
+        i = 0
+        while i < len(neighbourhoods) and not self.interrupted():
+            if neighbourhoods[i]():
+                moves += 1
+                i = 0
+            else:
+                i += 1
+        if self.stats:
+            self.stats.count("localMoves", moves)
+        return moves
+    
+    def resetPossibleWorkDays(self) -> None:
+    # Rebuilds the possible work days of everyone from R and x
+        np.bitwise_and(self.R, self.x, out=self.possibleWorkDays)
+        np.bitwise_xor(self.R, self.possibleWorkDays, out=self.possibleWorkDays)
+        self.dirty[:] = True
+        self.removeImpossibleShifts()
+    
+    def repair(self) -> int:
+    # Fills the open slots of the current x without removing anything, as the repair step of vns does
+        self.resetPossibleWorkDays()
+        self.addShifts()
+        self.updateY()
+        return self.cost()
+    
+    def shakeBatch(self, x: np.ndarray, k: int, candidates: int) -> np.ndarray:
+    # Stacks candidates copies of x, each with k random shifts of random people (of self.focus when set)
+    # removed as removeShifts does
+        xs = np.repeat(x[np.newaxis], candidates, axis=0)
+        rows = np.arange(candidates)
+        keys = np.empty((candidates, len(self.allShifts)))
+        for _ in range(k):
+            if self.focus is None:
+                ids = self.rng.integers(self.peopleNumber, size=candidates)
+            else:
+                ids = self.rng.choice(self.focus, size=candidates)
+            worked = xs[rows, ids]
+            self.rng.random(out=keys)
+            keys[worked == 0] = -1
+            days = np.argmax(keys, axis=1)
+            has = worked.any(axis=1)
+            xs[rows[has], ids[has], days[has]] = 0
+        return xs
+    
+    def batchStep(self, best: tuple, best_cost: int, size: int, candidates: int) -> int:
+    # Shakes and repairs candidates copies of the best solution at once (shakeBatch and RND.fillBatch) and returns
+    # the cost of the cheapest, which is loaded into x when it improves on best_cost
+        with phase(self.stats, "shake"):
+            xs = self.shakeBatch(best[0], size, candidates)
+        with phase(self.stats, "repair"):
+            costs = self.fillBatch(xs, self.focus)
+        with phase(self.stats, "evaluation"):
+            chosen = int(np.argmin(costs))
+            new = int(costs[chosen])
+            if new < best_cost:
+                self.loadSolution(xs[chosen])
+                self.updateY()
+        return new
+    
+    def sequentialStep(self, best: tuple, size: int, local: bool) -> int:
+    # Removes size shifts of random people (of self.focus when set) from the best solution, repairs it, runs
+    # localSearch when local is set and returns the cost of the result, which is left in x
+        with phase(self.stats, "shake"):
+            self.restoreState(best)
+            for _ in range(size):
+                if self.focus is None:
+                    id = self.rng.integers(self.peopleNumber)
+                else:
+                    id = self.rng.choice(self.focus)
+                self.removeShifts(id)
+        with phase(self.stats, "repair"):
+            self.addShifts()
+        if local:
+            with phase(self.stats, "localSearch"):
+                self.localSearch()
+        with phase(self.stats, "evaluation"):
+            self.updateY()
+            return self.cost()
+    
+    def vns(self, kmax: int, max_iter, stop=None, exchange=None, sync_every=10, candidates=1, local_search=False, adaptive=None, checkpoint=None) -> None:
     # Run the vns algorithm    
+    # stop (see stopping.StopCriteria) ends the search before max_iter passes. With max_iter=None every pass starts
+    # again from k=1 until stop ends it. The best solution found is kept in x in every case
+    # exchange is called with (best_x, best_cost) after every improvement and every sync_every neighbourhoods,
+    # and may return a better incumbent (x, cost) found elsewhere, which is then adopted
+    # Every step is a batchStep with candidates > 1 and a sequentialStep otherwise (with localSearch if local_search)
+    # adaptive ("gain" or "rate", see adaptive.NeighbourhoodController) draws the shake size and move type of every
+    # step from self.controller instead of using k. k still counts the steps of a pass, so max_iter means the same
+    # checkpoint (see checkpoint.CheckpointSettings) saves the search state with saveCheckpoint and resumes it
+        stop = stop or StopCriteria()
+        if max_iter is None and not stop.bounded():
+            raise ValueError("max_iter=None needs time_limit, target_cost or max_no_improve")
+        start = time()
+        self.controller = None
+        if adaptive:
+            moves = ("rebuild",) if candidates > 1 else ("rebuild", "local")
+            self.controller = NeighbourhoodController(kmax, self.rng, moves, adaptive)
+        saved = self.loadCheckpoint(checkpoint.path) if checkpoint and checkpoint.resume else None
         self.xRnd = np.copy(self.x)
-        intersect = np.bitwise_and(self.R, self.x)
-        self.possibleWorkDays = np.bitwise_xor(self.R, intersect)  
-        self.removeImpossibleShifts()
+        self.resetPossibleWorkDays()
         k = 1
-        best_x = np.copy(self.x)
+        best = self.saveState()
         best_cost = self.cost()
-        for _ in range(max_iter):
+        evaluated = 0
+        stale = 0
+        self.stopReason = None
+        passes = 0
+        if saved:
+            k, passes, evaluated, stale, elapsed = saved
+            start -= elapsed
+        self.running = (stop, start)
+        # A resumed search goes straight back into the pass it was saved in
+        inside = saved is not None
+        saved_at = time()
+        while self.stopReason is None:
+            if not inside:
+                if stop.optimal(best_cost):
+                    self.stopReason = "lower_bound"
+                    break
+                if max_iter is None:
+                    k = 1
+                elif passes == max_iter or k > kmax:
+                    # k only goes back to 1 on improvement, so once it passes kmax the remaining iterations are empty
+                    self.stopReason = "max_iter"
+                    break
+                passes += 1
+            inside = False
             while k <= kmax:
-                self.x = np.copy(best_x)
-                for _ in range(k):
-                    id = np.random.choice(np.arange(self.peopleNumber))
-                    self.removeShifts(id)
-                self.addShifts()
-                self.updateY()
-                new = self.cost()
-                if new < best_cost:
+                self.stopReason = stop.reason(best_cost, time() - start, stale)
+                if self.stopReason:
+                    break
+                size, local = k, local_search
+                if self.controller:
+                    arm = self.controller.choose()
+                    size, move = self.controller.arms[arm]
+                    local = move == "local"
+                    cpu = process_time()
+                if candidates > 1:
+                    new = self.batchStep(best, best_cost, size, candidates)
+                else:
+                    new = self.sequentialStep(best, size, local)
+                evaluated += 1
+                improved = new < best_cost
+                if self.controller:
+                    self.controller.update(arm, best_cost - new, process_time() - cpu)
+                if self.stats:
+                    self.stats.count("moves", candidates)
+                    self.stats.count("improvingMoves", int(improved))
+                    self.stats.record(time() - start, size, min(new, best_cost))
+                if improved:
                     #print(f"New best: {new}")
-                    best_x = np.copy(self.x)
+                    best = self.saveState()
                     best_cost = new
                     k = 1
-                    continue
-                k += 2
-        self.x = np.copy(best_x)
+                    stale = 0
+                else:
+                    k += 2
+                    stale += 1
+                if exchange and (improved or evaluated % sync_every == 0):
+                    shared = exchange(best[0], best_cost)
+                    if shared is not None:
+                        self.loadSolution(shared[0])
+                        best = self.saveState()
+                        best_cost = shared[1]
+                        k = 1
+                        stale = 0
+                if checkpoint and checkpoint.due(evaluated, time() - saved_at):
+                    self.saveCheckpoint(checkpoint.path, best[0], best_cost, k, passes, evaluated, stale, time() - start)
+                    saved_at = time()
+        if checkpoint:
+            self.saveCheckpoint(checkpoint.path, best[0], best_cost, k, passes, evaluated, stale, time() - start)
+        self.restoreState(best)
         self.updateY()
+        self.running = None
+        if self.stats and self.controller:
+            self.stats.adaptive = self.controller.toDict()
         #self.display()
         #self.compare()
         return best_cost
     
+    def saveCheckpoint(self, path: str, x: np.ndarray, cost: int, k: int, passes: int, evaluated: int, stale: int, elapsed: float) -> None:
+    # Writes the best solution, the loop counters of vns, the order of the people and the random stream
+    # (and the adaptive controller) atomically to path
+        arrays = {"x": np.packbits(x, axis=1), "people": self.P}
+        if self.controller:
+            arrays.update({f"controller_{name}": value for name, value in self.controller.saveState().items()})
+        header = {
+            "shape": list(x.shape),
+            "cost": int(cost),
+            "loop": [int(k), int(passes), int(evaluated), int(stale), float(elapsed)],
+            "rng": self.rng.bit_generator.state,
+        }
+        checkpoints.save(path, arrays, header)
+    
+    def loadCheckpoint(self, path: str):
+    # Brings back the state written by saveCheckpoint and returns the loop counters of vns,
+    # or None when path does not exist yet
+        saved = checkpoints.load(path)
+        if saved is None:
+            return None
+        arrays, header = saved
+        if tuple(header["shape"]) != self.x.shape:
+            raise ValueError(f"checkpoint {path} is for a {header['shape']} x, not {list(self.x.shape)}")
+        self.loadSolution(np.unpackbits(arrays["x"], axis=1, count=self.x.shape[1]))
+        self.P[:] = arrays["people"]
+        self.order[:] = [self.peopleIndex[p] for p in self.P]
+        self.rng.bit_generator.state = header["rng"]
+        if self.controller:
+            self.controller.restoreState({name[len("controller_"):]: value for name, value in arrays.items() if name.startswith("controller_")})
+        return tuple(header["loop"])
+    
+    def multiStart(self, batch: int, starts: int, kmax: int, max_iter, **options) -> int:
+    # Builds batch random schedules at once (see RND.randomSchedules) and runs vns from the starts cheapest,
+    # keeping the best result in x. options are passed to every vns call, so a time_limit in stop applies to each start
+        if not 1 <= starts <= batch:
+            raise ValueError(f"starts must be between 1 and batch ({batch}), got {starts}")
+        xs, costs = self.randomSchedules(batch)
+        best, best_cost = None, None
+        for b in np.argsort(costs, kind="stable")[:starts]:
+            self.loadSolution(xs[b])
+            self.updateY()
+            cost = self.vns(kmax, max_iter, **options)
+            if best_cost is None or cost < best_cost:
+                best, best_cost = self.saveState(), cost
+        self.restoreState(best)
+        self.updateY()
+        return best_cost
+    
     def compare(self) -> None:
     # Display  the difference between the original and the new schedule    
         intersect = np.bitwise_and(self.x, self.xRnd)
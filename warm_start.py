@@ -0,0 +1,120 @@
+'''
+  Warm-start re-solve of a published roster after people change their requests or shifts are added or removed.
+  The previous x is carried over to the new instance, the cells that are no longer valid are dropped, and a
+  short vns that only shakes and repairs the people touched by the change (VNS.focus) fills the gaps, so the
+  rest of the roster stays as it was.
+  Diff:
+    requests (dict): {name: new list of shifts}. A new name adds a person and None removes one.
+    slots (dict): {shift: new number of slots}. 0 removes the shift.
+'''
+from time import perf_counter
+
+import numpy as np
+
+from shift_codec import encode, matrix_index
+from vns_mh import VNS
+
+def apply_diff(restrictions: dict, people_dict: dict, requests=None, slots=None) -> tuple:
+# Returns (restrictions, people_dict) of the changed instance and, for every new row, its row in the old one
+# (-1 for the people added). Kept people stay in their order and new people go last
+    requests = requests or {}
+    slots = slots or {}
+    old = list(restrictions["People"])
+    index = {p: i for i, p in enumerate(old)}
+    names = [p for p in old if requests.get(p, True) is not None]
+    names += [p for p in requests if p not in index and requests[p] is not None]
+    rows = np.array([index.get(p, -1) for p in names], dtype=int)
+
+    new = dict(restrictions)
+    if isinstance(restrictions["People"], dict):
+        new["People"] = {p: requests[p] if p in requests else restrictions["People"][p] for p in names}
+    else:
+        new["People"] = names
+    if "R" in restrictions:
+        R = np.zeros((len(names), 2 * restrictions["MonthDays"]), dtype=np.uint8)
+        R[rows >= 0] = np.asarray(restrictions["R"])[rows[rows >= 0]]
+        for i, p in enumerate(names):
+            if p in requests:
+                R[i] = 0
+                R[i, matrix_index(encode(requests[p]))] = 1
+        new["R"] = R
+
+    # Vacancies keep their order: extra copies of a shift are dropped from the end and new ones appended
+    shifts, seen = [], {}
+    for s in restrictions["Shifts"]:
+        seen[s] = seen.get(s, 0) + 1
+        if s not in slots or seen[s] <= slots[s]:
+            shifts.append(s)
+    for s, count in slots.items():
+        shifts += [s] * (count - seen.get(s, 0))
+    new["Shifts"] = shifts
+    if "Slots" in restrictions:
+        capacity = np.array(restrictions["Slots"], dtype=int)
+        for s, count in slots.items():
+            capacity[matrix_index(encode([s]))] = count
+        new["Slots"] = capacity
+
+    priority = max((v["Priority"] for v in people_dict.values()), default=-1)
+    new_people = {}
+    for p in names:
+        if p in people_dict:
+            new_people[p] = dict(people_dict[p])
+        else:
+            priority += 1
+            new_people[p] = {"Priority": priority, "MaxShifts": restrictions["MaxShifts"]}
+        if p in requests:
+            new_people[p]["Requests"] = requests[p]
+    return new, new_people, rows
+
+def resolve(restrictions: dict, people_dict: dict, x, requests=None, slots=None, kmax=3, max_iter=1, seed=0, **options) -> tuple:
+# Re-solves the roster x of restrictions after the diff and returns (cost, x, restrictions, people_dict, report)
+# of the changed instance. options are passed to vns
+    start = perf_counter()
+    requests = requests or {}
+    slots = slots or {}
+    new, new_people, rows = apply_diff(restrictions, people_dict, requests, slots)
+    names = list(new["People"])
+    vns = VNS(new, seed)
+
+    x = np.asarray(x, dtype=np.uint8)
+    previous = np.zeros_like(vns.x)
+    previous[rows >= 0] = x[rows[rows >= 0]]
+    current = np.bitwise_and(previous, vns.R)
+    # Shifts that lost slots keep a random subset of their people
+    coverage = np.sum(current, axis=0, dtype=int)
+    for t in np.flatnonzero(coverage > vns.capacity):
+        workers = np.flatnonzero(current[:, t])
+        current[vns.rng.choice(workers, coverage[t] - vns.capacity[t], replace=False), t] = 0
+    vns.loadSolution(current)
+    dropped_cost = vns.cost()
+
+    gone = [i for i, p in enumerate(restrictions["People"]) if p not in new_people]
+    touched = np.any(current != previous, axis=1) | (rows < 0)
+    touched |= np.isin(names, list(requests))
+    # Shifts that lost people or changed slots, also from the rows of the people removed
+    shifts = np.any(current != previous, axis=0) | np.any(x[gone], axis=0)
+    shifts[matrix_index(encode(list(slots)))] = True
+    touched |= np.any(vns.R[:, shifts], axis=1)
+    vns.focus = np.flatnonzero(touched)
+    if vns.focus.size:
+        vns.repair()
+        cost = vns.vns(kmax, max_iter, **options)
+    else:
+        cost = vns.cost()
+
+    old = list(restrictions["People"])
+    kept = int(np.sum(previous & vns.x))
+    report = {
+        "addedPeople": [p for p, r in zip(names, rows) if r < 0],
+        "removedPeople": [old[i] for i in gone],
+        "focusPeople": int(vns.focus.size),
+        "changedPeople": [p for p, changed in zip(names, np.any(vns.x != previous, axis=1)) if changed] + [old[i] for i in gone],
+        "addedShifts": int(np.sum(vns.x > previous)),
+        "removedShifts": int(np.sum(previous > vns.x)) + int(np.sum(x[gone])),
+        "keptShifts": kept,
+        "keptFraction": kept / max(1, int(np.sum(x))),
+        "droppedCost": dropped_cost,
+        "cost": cost,
+        "seconds": perf_counter() - start,
+    }
+    return cost, np.copy(vns.x), new, new_people, report